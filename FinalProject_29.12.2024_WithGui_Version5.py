@@ -1,496 +1,426 @@
 import numpy as np
 import warnings
-import random
 import time
-from collections import Counter
+import queue
+import threading
 import matplotlib.pyplot as plt
 import spectral
 import huffman
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk, font
 from tabulate import tabulate
+from synthetic_cube import generate_synthetic_cube
+from kernels import get_backend, warmup_kernels
+from codec import (
+    calculate_predictor, compute_residuals, zigzag_encode, zigzag_decode, residual_frequencies, sample_bit_depth, ns_per_sample,
+    near_lossless_encode, near_lossless_decode, max_abs_error, data_peak, psnr, spectral_angle,
+    huffman_encode_bitstring, huffman_decode_bitstring, crc_hamming_encode, crc_hamming_decode_and_validate,
+    hamming_encode_vectorized, hamming_decode_bitstring, introduce_errors, Calculate_Ber_NO_CRC, Calculate_Ber_After_CRC
+)
 
 
 # Suppress warnings
 warnings.filterwarnings("ignore")
 
 
-# Constants for CRC
-CRC_POLY = 0b1011
-CRC_BITS = 3
-
-
-# Hamming matrices for (7,4) code
-G = np.array([[1, 0, 0, 0, 1, 1, 0],
-              [0, 1, 0, 0, 1, 0, 1],
-              [0, 0, 1, 0, 1, 1, 1],
-              [0, 0, 0, 1, 0, 1, 1]])
-
-H = np.array([[1, 1, 1, 0, 1, 0, 0],
-              [1, 0, 1, 1, 0, 1, 0],
-              [0, 1, 1, 1, 0, 0, 1]])
-
-
-
-# CRC Encoding function
-def crc_encode(data):
-    data = np.concatenate([data, [0] * CRC_BITS])  # This prepares the data for CRC calculation by appending 3 zeros for CRC bits.
-    for i in range(len(data) - CRC_BITS):
-        if data[i]:
-            for j in range(CRC_BITS + 1):
-                data[i + j] ^= (CRC_POLY >> (CRC_BITS - j)) & 1
-    return data[-CRC_BITS:]
-
-
-
-# CRC Check function
-def crc_check(data): # Checks whether the CRC bits in the data are valid
-    check = np.copy(data)
-    for i in range(len(check) - CRC_BITS):
-        if check[i]:
-            for j in range(CRC_BITS + 1):
-                check[i + j] ^= (CRC_POLY >> (CRC_BITS - j)) & 1
-    return not any(check[-CRC_BITS:])
-
-
+# GUI Functions
 
-# Hamming Encoding function
-def hamming_encode_vectorized(bitstring):
-    bitstring = np.pad(bitstring, (0, (4 - len(bitstring) % 4) % 4), 'constant')
-    bitstring = np.reshape(bitstring, (-1, 4))
-    encoded_bitstring = (np.dot(bitstring, G) % 2).reshape(-1)
-    return encoded_bitstring
+def load_image():
+    global image, choice
+    choice = 1 # Indicate that the image is being loaded (choice 1)
+    try:
+        # Load the hyperspectral image using the spectral library, keeping the sensor's native integer samples
+        lan_image = spectral.open_image('92AV3C.lan')
+        image = lan_image.load(dtype=lan_image.dtype)
+        # Log metadata about the loaded image (data type, size, dimensions)
+        log_output(f"Data type: {image.dtype}\nSize in bits per pixel: {image.dtype.itemsize * 8}\nImage dimensions: {image.shape}", bold=True)
+        update_status("Loaded IAN image successfully.", bold=True) # Update the status bar to indicate successful loading
+        spectral.view_cube(image, shape=[144, 144, 219]) # Display the hyperspectral image cube for visualization
+    except Exception as e:
+        # Show an error message box if the image fails to load
+        messagebox.showerror("Error", f"Failed to load image: {e}")
 
 
 
-# Hamming Decoding function
-def hamming_decode_7bit(received_block):
-    syndrome = np.dot(received_block, H.T) % 2
-    if np.any(syndrome):
-        error_position = np.where((H.T == syndrome).all(axis=1))[0][0]
-        received_block[error_position] ^= 1
-    return received_block[:4]
 
+def create_custom_image():
+    global image, choice
+    choice = 2  # Indicate that the custom image option is selected
+    try:
+        # Get the dimensions from the GUI entry (expected format: "x,y,z")
+        dims = dimensions_entry.get()
+        x, y, z = map(int, dims.split(','))
+        # Validate dimensions (spatial dimensions must be at least 2x2)
+        if x < 2 or y < 2:
+            raise ValueError("Dimensions must be at least 2x2 in the first two axes.")
 
+        # Optional seed so the same synthetic cube can be reproduced
+        seed_text = seed_entry.get().strip()
+        seed = int(seed_text) if seed_text else None
 
-# Function to encode using CRC and Hamming
-def crc_hamming_encode(bitstring):
-    # Step 1: Pad the bitstring to make its length a multiple of 13
-    padding_length = (13 - len(bitstring) % 13) % 13     
-    bitstring = np.pad(bitstring, (0, padding_length), 'constant')
- 
-    # Step 2: Split the bitstring into blocks of 13 bits and extend them for CRC
-    blocks = bitstring.reshape(-1, 13)
-    extended_blocks = np.pad(blocks, ((0, 0), (0, CRC_BITS)), constant_values=0)
+        # Create a seeded hyperspectral image with spatial and spectral correlation, stored as 16-bit sensor samples
+        hyperspectral_image = generate_synthetic_cube(x, y, z, seed=seed)
 
-    # Step 3: Calculate the CRC for each block using the CRC polynomial
-    for i in range(13):
-        mask = extended_blocks[:, i] == 1
-        for j in range(CRC_BITS + 1):
-            extended_blocks[mask, i + j] ^= (CRC_POLY >> (CRC_BITS - j)) & 1
-   
-    # Step 4: Append the calculated CRC bits to the original blocks
-    crc = extended_blocks[:, -CRC_BITS:]
-    combined_blocks = np.hstack((blocks, crc))
-    
-    # Step 5: Reshape the combined blocks into 4-bit groups and encode with Hamming (7,4)
-    reshaped_blocks = combined_blocks.reshape(-1, 4)
-    encoded_blocks = np.dot(reshaped_blocks, G) % 2
-
-    return encoded_blocks.flatten()  # Return the flattened encoded bitstring
+        # Update the global image variable
+        image = hyperspectral_image
+        # Log image metadata and dimensions
+        log_output(f"Created Created custom image with dimensions: {image.shape}", bold=True)
+        log_output(f"Data type: {image.dtype}\nSize in bits per pixel: {image.dtype.itemsize * 8}\n", bold=True)
+        # Update the status bar to indicate successful creation
+        update_status(f"Created custom image with dimensions: {image.shape}", bold=True)
+    except Exception as e:
+        # Display an error message if the image creation fails
+        messagebox.showerror("Error", f"Failed to create image: {e}")
 
 
 
+# System Run Function
 
-# Function to decode the data after CRC and Hamming decoding
-def crc_hamming_decode_and_validate(received_bitstring):
-    # Initialize variables for decoded data and block validation tracking
-    decoded_blocks = [] # Stores the decoded bits from valid blocks
-    valid_indices = [] # List to store the indices of valid blocks' bits
-    valid_blocks = 0 # Counter to track the number of valid blocks
-    invalid_blocks = 0 # Counter to track the number of invalid blocks
-    current_index = 0 # Tracks the starting index for each block in the original bitstring
-    
-    # Process the received bitstring in chunks of 28 bits (size of one block with Hamming and CRC
-    for i in range(0, len(received_bitstring), 28):
-        received_block = received_bitstring[i:i+28] # Extract the current block
-        if len(received_block) != 28:
-            continue  # Skip incomplete blocks
-
-        # Decode each 7-bit segment within the 28-bit block using Hamming
-        decoded_block = [] # Store the 4-bit decoded outputs for this block
-        for j in range(0, 28, 7):
-            decoded_block.extend(hamming_decode_7bit(received_block[j:j+7]))
-
-        # Check CRC for the decoded block
-        if crc_check(np.array(decoded_block)):
-            # If the block is valid, exclude the CRC bits and add the data bits to the result
-            decoded_blocks.extend(decoded_block[:-CRC_BITS]) # Add the first 13 bits (data) to the result
-            # Track the indices of the valid bits in the original data
-            valid_indices.extend(range(current_index, current_index + 13))
-            valid_blocks += 1 # Increment the valid block counter
+# Stages reported by the pipeline worker, in order, for the progress bar
+PIPELINE_STAGES = [
+    "Predictor & residuals",
+    "Huffman encoding",
+    "Channel encoding",
+    "Error injection",
+    "Channel decoding",
+    "Huffman decoding & reconstruction",
+    "Quantitative requirements",
+]
+
+
+# Raised inside the worker when the user presses Cancel
+class PipelineCancelled(Exception):
+    pass
+
+
+# Full encode/decode pipeline. Runs in a worker thread and never touches Tk widgets directly:
+# log lines, status updates, progress and the preview images are sent to the GUI through the events queue.
+# max_error > 0 selects the near-lossless mode (closed-loop prediction with a bounded per-pixel error).
+def run_pipeline(image, use_crc, error_rate, events, cancel_event, max_error=0):
+    def log(message, **style):
+        events.put(("log", message, style))
+
+    def status(message, bold=False):
+        events.put(("status", message, bold))
+
+    # Cancellation is checked between stages and periodically inside the long decoding loops
+    def check_cancel():
+        if cancel_event.is_set():
+            raise PipelineCancelled()
+
+    def stage(index):
+        check_cancel()
+        events.put(("progress", index))
+
+    def reconstruct(decoded_differences):
+        if max_error > 0:
+            return near_lossless_decode(decoded_differences, max_error, image.dtype)
+        return predictor + decoded_differences
+
+    def check_reconstruction(decompressed_image):
+        if np.array_equal(image[:, :, :5], decompressed_image):
+            log("*** Decompressed image matches the original image ***", bold=True, italic=True, color="green", font_size=16)
+            log('')
+        elif max_error > 0 and max_abs_error(image[:, :, :5], decompressed_image) <= max_error:
+            log(f"*** Decompressed image is within \u00b1{max_error} DN of the original image ***", bold=True, italic=True, color="green", font_size=16)
+            log('')
         else:
-            invalid_blocks += 1 # Increment the invalid block counter
+            log("*** Decompressed image does not match the original image ***", bold=True, italic=True, color="red", font_size=16)
+
+    # Predictor Calculation
+    stage(0)
+    warmup_kernels() # No-op once the start-up warmup has finished; keeps the JIT latency out of the measured time
+    start_time = time.time()
+    if max_error > 0:
+        # Near-lossless: quantized residuals of the closed-loop predictor
+        differences, _ = near_lossless_encode(image, max_error)
+        log(f"Near-lossless mode: maximum absolute error {max_error} DN", bold=True)
+    else:
+        predictor = calculate_predictor(image) # Calculate the predictor on the first 5 bands
+        differences = compute_residuals(image, predictor) # Integer residuals computed in place
+    symbols = zigzag_encode(differences) # Map the signed residuals to non-negative symbols
+    flat_symbols = symbols.ravel()
+    log(f"Differences shape: {differences.shape}", bold=True)
+    log("-" * 50)
 
-        # Update the starting index for the next block
-        current_index += 13
 
-    # Return the decoded data, indices of valid bits, and block statistics
-    return np.array(decoded_blocks), valid_indices, valid_blocks, invalid_blocks
+    # Huffman Encoding
+    stage(1)
+    frequency = residual_frequencies(flat_symbols) # Count the frequency of each symbol with a histogram
+    huffman_tree = huffman.codebook(frequency) # Build the Huffman tree
+    encoded_data = huffman_encode_bitstring(flat_symbols, huffman_tree) # Encode data
+    Process_neto_time = time.time() - start_time # Record process time up to this point
 
 
 
-# Function to introduce random errors
-def introduce_errors(encoded_bitstring, error_rate):
-    received_bitstring = np.copy(encoded_bitstring)  # Create a copy of the bitstring to avoid modifying the original
-    if error_rate == 0:
-        return received_bitstring  # No errors injected
-    
-    # Inject errors into the bitstring randomly at intervals determined by the error rate
-    for i in range(0, len(received_bitstring), error_rate):
-        block_start = i # Start of the current block
-        block_end = min(i + error_rate, len(received_bitstring)) # End of the current block
-        error_index = random.randint(block_start, block_end - 1) # Select a random bit to flip
-        received_bitstring[error_index] ^= 1 # Flip the selected bit
-    return received_bitstring
+    # Encoding with CRC or without CRC
+    stage(2)
+    if use_crc == 'YES':
+        log("Using CRC and Hamming encoding...")
+        log('')
+        encoded_bitstring = crc_hamming_encode(encoded_data)  # Apply CRC and Hamming (7,4) encoding to the data
+    else:
+        log("Using Hamming encoding without CRC...")
+        log('')
+        encoded_bitstring = hamming_encode_vectorized(encoded_data) # Encode with Hamming only
 
-    
 
-# Function to calculate BER before and after correction
-def Calculate_Ber_NO_CRC(original, received):
-    errors = np.sum(original != received)
-    total_bits = len(original)
-    return errors / total_bits
+    # Error Injection
+    stage(3)
+    received_with_errors = introduce_errors(encoded_bitstring, error_rate)
+    ber_before_correction = Calculate_Ber_NO_CRC(encoded_bitstring, received_with_errors)
 
 
-# Function to calculate the BER after CRC validation
-def Calculate_Ber_After_CRC(original, received, valid_indices):
-    original = np.array(original)
-    received = np.array(received)
-    # Filter the original bitstring to include only valid bits
-    original_filtered = np.array([original[idx] for idx in valid_indices if idx < len(original)])
-    # Filter the received bitstring to match the length of the valid original bitstring
-    received_filtered = received[:len(original_filtered)]
-    # Calculate the number of bit errors using XOR
-    errors = np.sum(np.array(original_filtered, dtype=np.uint8) ^ np.array(received_filtered, dtype=np.uint8))
-    # Calculate BER as the number of errors divided by the number of valid bits
-    ber = errors / len(original_filtered) if len(original_filtered) > 0 else 0
-    return ber
+    # Decoding and BER Calculation
+    stage(4)
+    if use_crc == 'YES':
 
+        # Decode the received bitstring using CRC and Hamming decoding
+        decoded_bitstring, valid_indices, valid_blocks, invalid_blocks = crc_hamming_decode_and_validate(received_with_errors, check_cancel)
+        stage(5)
+        decoded_differences_list = huffman_decode_bitstring(decoded_bitstring, huffman_tree, check_cancel)
 
+        # Check and adjust the size of the decoded data before reshaping
+        expected_size = np.prod(differences.shape) # Calculate the expected size of the data based on the original differences array
+        actual_size = len(decoded_differences_list) # Actual size of the decoded data
 
-# Predictor Calculation
-def calculate_predictor(image):
-    # creates the Predictor for each pixel based on its right neighbor in the same row for the first 5 spectral bands.
-    predictor = np.roll(image[:, :, :5], shift=-1, axis=1)
-    #For the last column we creates the Predictor for each pixel based on its left neighbor to handle the missing right neighbor.
-    predictor[:, -1, :] = predictor[:, -2, :]
-    return predictor
+        log(f"Expected size: {expected_size}, Actual size: {actual_size}", bold=True)
 
+        # Handle size mismatch: pad with zeros or truncate excess values
+        if actual_size < expected_size:
+            decoded_differences_list += [0] * (expected_size - actual_size) # Pad with zeros
+        elif actual_size > expected_size:
+            decoded_differences_list = decoded_differences_list[:expected_size] # Truncate excess data
 
+        # Reshape the decoded differences to match the original dimensions
+        decoded_differences = zigzag_decode(decoded_differences_list).reshape(differences.shape)
 
-# Hamming Decode Bitstring function
-def hamming_decode_bitstring(received_bitstring, original_length):
-    decoded_bitstring = [] # Initialize an empty list to store decoded bits
-    # Iterate through the received bitstring in chunks of 7 bits (Hamming block size)
-    for i in range(0, len(received_bitstring), 7):
-        received_block = received_bitstring[i:i+7] # Extract the current 7-bit block
-        decoded_block = hamming_decode_7bit(received_block) # Decode the 7-bit block into 4 bits
-        decoded_bitstring.extend(decoded_block) # Add the decoded bits to the result
-    return np.array(decoded_bitstring[:original_length])
+        # Reconstruct the decompressed image from the decoded differences
+        decompressed_image = reconstruct(decoded_differences)
 
+        # Display the original image, compressed differences, and the reconstructed decompressed image
+        events.put(("display", image, differences, decompressed_image))
 
+        # Calculate BER after correction
+        ber_after_correction = Calculate_Ber_After_CRC(encoded_data, decoded_bitstring, valid_indices)
 
+        # Log the number of valid and invalid blocks
+        log(f"*** Number of Valid Blocks: {valid_blocks} ***", bold=True, italic=True, color="green")
+        log(f"*** Invalid Removed Blocks: {invalid_blocks} ***", bold=True, italic=True, color="red")
+        log('')
 
-# Huffman Encoding function
-def huffman_encode_bitstring(flat_differences, huffman_tree):
-    encoded_bits = []  # Initialize an empty list to store the encoded bits
-    # Iterate through each symbol in the input sequence
-    for symbol in flat_differences:
-        # Retrieve the Huffman code for the current symbol from the Huffman tree
-        # Convert the Huffman code (string) into a list of integers (binary digits)
-        encoded_bits.extend(list(map(int, huffman_tree[symbol])))
-    return np.array(encoded_bits)
+        # Check whether the decompressed image matches the original first 5 bands of the original image
+        check_reconstruction(decompressed_image)
 
+    else:
+        # Decode the received bitstring using Hamming decoding without CRC
+        decoded_bitstring = hamming_decode_bitstring(received_with_errors, len(encoded_data), check_cancel)
+        stage(5)
+        decoded_differences_list = huffman_decode_bitstring(decoded_bitstring, huffman_tree, check_cancel)  # Using the inverse Huffman tree
+        # Check and adjust the size of the decoded data before reshaping
+        expected_size = np.prod(differences.shape) # Expected size based on the original differences
+        actual_size = len(decoded_differences_list) # Actual size of the decoded data
 
 
-# Function to decode Huffman encoded bit sequence
-def huffman_decode_bitstring(encoded_data, huffman_tree):
-    decoded_data = []  # Initialize the list to store the decoded symbols
-    buffer = ""
-    inverse_huffman_tree = {v: k for k, v in huffman_tree.items()} # Create an inverse Huffman tree to map Huffman codes back to their corresponding symbols
-    # Iterate through each bit in the encoded data
-    for bit in encoded_data:
-        buffer += str(bit)  # Convert bit to string explicitly
-        if buffer in inverse_huffman_tree:
-            # Decode the symbol and add it to the decoded data
-            decoded_data.append(int(inverse_huffman_tree[buffer]))  # Ensure decoded values are integers
-            buffer = ""
-    return decoded_data
+        # Handle size mismatch: pad with zeros or truncate excess values
+        if actual_size < expected_size:
+            decoded_differences_list += [0] * (expected_size - actual_size) # Add zeros for missing data
+        elif actual_size > expected_size:
+            decoded_differences_list = decoded_differences_list[:expected_size] # Truncate extra data
 
+        # Rebuild the decompressed image from the decoded differences
+        decoded_differences = zigzag_decode(decoded_differences_list).reshape(differences.shape)
+        decompressed_image = reconstruct(decoded_differences)
+        # Display the original image, compressed data (differences), and the reconstructed decompressed image
+        events.put(("display", image, differences, decompressed_image))
+        ber_after_correction = Calculate_Ber_NO_CRC(encoded_data, decoded_bitstring) # Calculate BER after correction
 
 
 
-# GUI Functions
+        # Check if the decompressed image matches the original image
+        check_reconstruction(decompressed_image)
 
-def load_image():
-    global image, choice
-    choice = 1 # Indicate that the image is being loaded (choice 1)
-    try:
-        # Load the hyperspectral image using the spectral library
-        image = spectral.open_image('92AV3C.lan').load()
-        # Log metadata about the loaded image (data type, size, dimensions)
-        log_output(f"Data type: {image.dtype}\nSize in bits per pixel: {image.dtype.itemsize * 8}\nImage dimensions: {image.shape}", bold=True)
-        update_status("Loaded IAN image successfully.", bold=True) # Update the status bar to indicate successful loading
-        spectral.view_cube(image, shape=[144, 144, 219]) # Display the hyperspectral image cube for visualization
-    except Exception as e:
-        # Show an error message box if the image fails to load
-        messagebox.showerror("Error", f"Failed to load image: {e}")
 
 
 
+    stage(6)
 
-def create_custom_image():
-    global image, choice
-    choice = 2  # Indicate that the custom image option is selected
-    try:
-        # Get the dimensions from the GUI entry (expected format: "x,y,z")
-        dims = dimensions_entry.get()
-        x, y, z = map(int, dims.split(','))
-        # Validate dimensions (spatial dimensions must be at least 2x2)
-        if x < 2 or y < 2:
-            raise ValueError("Dimensions must be at least 2x2 in the first two axes.")
+    # Compression Ratio (measured against the sensor's native bit depth)
+    bits_per_value = sample_bit_depth(image)
+    original_size = len(flat_symbols) * bits_per_value
+    compressed_size = len(encoded_data)
+    compression_ratio = original_size / compressed_size
 
-        # Create a base spatial gradient
-        base_pattern = np.outer(np.linspace(0, 1, x), np.linspace(0, 1, y))
+    # Rate/distortion metrics of the reconstructed bands
+    rate = compressed_size / len(flat_symbols)
+    error_max = max_abs_error(image[:, :, :5], decompressed_image)
+    peak = data_peak(image[:, :, :5]) # PSNR peak: dynamic range of the original bands
+    psnr_db = psnr(image[:, :, :5], decompressed_image, peak)
+    angle = spectral_angle(image[:, :, :5], decompressed_image)
 
-        # Create a hyperspectral image with spectral variatio
-        hyperspectral_image = np.zeros((x, y, z), dtype=np.float32)
-        for band in range(z):
-            spectral_variation = np.sin(2 * np.pi * band / z)  # שונות ספקטרלית
-            hyperspectral_image[:, :, band] = base_pattern + spectral_variation
+    # Results
+    total_bits = (image.shape[0] * image.shape[1] * image.shape[2])
+    time_per_pixel_ns = ns_per_sample(Process_neto_time, len(flat_symbols)) # Encode time per coded sample
+    computational_complexity = (1/total_bits) * 1e9
 
-        # Add random noise to the image
-        noise_level = 0.1  # רמת רעש
-        noise = np.random.normal(loc=0, scale=noise_level, size=(x, y, z))
-        hyperspectral_image += noise
+    # Generate textual result
+    results = (
+        f"Compression Ratio: 1:{compression_ratio:.2f}\n"
+        f"Rate: {rate:.3f} bits/sample\n"
+        f"Max Abs Error: {error_max} DN\n"
+        f"PSNR: {psnr_db:.2f} dB (peak = data range {peak} DN)\n"
+        f"Spectral Angle: {angle:.5f} degrees\n"
+        f"BER Before: {ber_before_correction:.10f}\n"
+        f"BER After: {ber_after_correction:.10f}\n"
+        f"Compression Time: {Process_neto_time:.6f} seconds\n"
+        f"Time Per Pixel: {time_per_pixel_ns:.2f} ns"
+    )
 
-        # Normalize and clip the values to a realistic range
-        hyperspectral_image = np.clip(hyperspectral_image * 17736, 0, 17736).astype(np.float32)
+    log("Quantitative Requirements:", bold=True, italic=True, font_size=18)
+    log(results, bold=True)
 
-        # Update the global image variable
-        image = hyperspectral_image
-        # Log image metadata and dimensions
-        log_output(f"Created Created custom image with dimensions: {image.shape}", bold=True)
-        log_output(f"Data type: {image.dtype}\nSize in bits per pixel: {image.dtype.itemsize * 8}\n", bold=True)
-        # Update the status bar to indicate successful creation
-        update_status(f"Created custom image with dimensions: {image.shape}", bold=True)
-    except Exception as e:
-        # Display an error message if the image creation fails
-        messagebox.showerror("Error", f"Failed to create image: {e}")
 
+    # Condition checks and logging
+    log("\u2500" * 50)
 
+    if compression_ratio > 4.0:
+        log("Meets the compression ratio requirement: compression ratio > 1:4", italic=True)
+    else:
+        log("Does not meet the compression ratio requirement: compression ratio ≤ 1:4", italic=True)
 
-# System Run Function
-def run_process():
-    try:
-        global image
-        # Retrieve user-selected options and parameters
-        use_crc = crc_var.get()
-        error_rate = int(error_rate_entry.get())
+    log("\u2500" * 50)
 
-        # Predictor Calculation
-        start_time = time.time()
-        predictor = calculate_predictor(image) # Calculate the predictor on the first 5 bands
+    if ber_after_correction < 1e-5:
+        log("Meets BER requirement: BER after < 10^-5", italic=True)
+    else:
+        log("Does not meet BER requirement: BER after ≥ 10^-5", italic=True)
 
-        differences = image[:, :, :5] - predictor
-        differences = differences.astype(np.float32)
-        flat_differences = differences.flatten()
-        log_output(f"Differences shape: {differences.shape}", bold=True)
-        log_output("-" * 50)
-        
-        
-        # Huffman Encoding
-        frequency = Counter(flat_differences) # Count the frequency of each symbol in the differences
-        huffman_tree = huffman.codebook(frequency.items()) # Build the Huffman tree
-        encoded_data = huffman_encode_bitstring(flat_differences, huffman_tree) # Encode data
-        Process_neto_time = time.time() - start_time # Record process time up to this point
+    log("\u2500" * 50)
 
-        
+    if time_per_pixel_ns <= 216:
+        log(f"Meets computational complexity requirement: time per pixel ≤ {computational_complexity:.2f} ns", italic=True)
+    else:
+        log(f"Does not meet computational complexity requirement: time per pixel > {computational_complexity:.2f} ns", italic=True)
 
-        # Encoding with CRC or without CRC
-        if use_crc == 'YES':
-            log_output("Using CRC and Hamming encoding...")
-            log_output('')
-            encoded_bitstring = crc_hamming_encode(encoded_data)  # Apply CRC and Hamming (7,4) encoding to the data
-        else:
-            log_output("Using Hamming encoding without CRC...")
-            log_output('')
-            encoded_bitstring = hamming_encode_vectorized(encoded_data) # Encode with Hamming only
+    log("\u2500" * 50)
 
 
-        # Error Injection
-        received_with_errors = introduce_errors(encoded_bitstring, error_rate)
-        ber_before_correction = Calculate_Ber_NO_CRC(encoded_bitstring, received_with_errors)
-        
+    # Final success check
+    if compression_ratio > 4.0 and ber_after_correction < 1e-5 and time_per_pixel_ns <= 216:
+        success_message = "*** The decoder has successfully decoded according to all required conditions! ***"
+        log(success_message, bold=True, italic=True, color="green")
+        status("Decoding Successful!", bold=True)
+    else:
+        failure_message = "*** The decoder does not meet all the required conditions for successful decoding ***."
+        log(failure_message, bold=True, italic=True, color="red")
+        status("Decoding may lead to incorrect results. Consider adjusting the parameters.", bold=True)
 
-        # Decoding and BER Calculation
-        if use_crc == 'YES':
-            
-            # Decode the received bitstring using CRC and Hamming decoding
-            decoded_bitstring, valid_indices, valid_blocks, invalid_blocks = crc_hamming_decode_and_validate(received_with_errors)
-            decoded_differences_list = huffman_decode_bitstring(decoded_bitstring, huffman_tree)
-           
-            # Check and adjust the size of the decoded data before reshaping
-            expected_size = np.prod(differences.shape) # Calculate the expected size of the data based on the original differences array
-            actual_size = len(decoded_differences_list) # Actual size of the decoded data
- 
-            log_output(f"Expected size: {expected_size}, Actual size: {actual_size}", bold=True)
-
-            # Handle size mismatch: pad with zeros or truncate excess values
-            if actual_size < expected_size:
-                decoded_differences_list += [0] * (expected_size - actual_size) # Pad with zeros
-            elif actual_size > expected_size:
-                decoded_differences_list = decoded_differences_list[:expected_size] # Truncate excess data
-
-            # Reshape the decoded differences to match the original dimensions
-            decoded_differences = np.array(decoded_differences_list).astype(np.int32).reshape(differences.shape)
-            
-            # Reconstruct the decompressed image by adding the predictor to the decoded differences
-            decompressed_image = predictor + decoded_differences
-            
-            # Display the original image, compressed differences, and the reconstructed decompressed image
-            display_images(image, differences, decompressed_image)
-            
-            # Calculate BER after correction
-            ber_after_correction = Calculate_Ber_After_CRC(encoded_data, decoded_bitstring, valid_indices)
-            
-            # Log the number of valid and invalid blocks
-            log_output(f"*** Number of Valid Blocks: {valid_blocks} ***", bold=True, italic=True, color="green")
-            log_output(f"*** Invalid Removed Blocks: {invalid_blocks} ***", bold=True, italic=True, color="red")
-            log_output('')
-            
-            # Check whether the decompressed image matches the original first 5 bands of the original image
-            if np.array_equal(image[:, :, :5], decompressed_image):
-                log_output("*** Decompressed image matches the original image ***", bold=True, italic=True, color="green", font_size=16)
-                log_output('')
-
-            else:
-                log_output("*** Decompressed image does not match the original image ***", bold=True, italic=True, color="red", font_size=16)
-            
-        else:
-            # Decode the received bitstring using Hamming decoding without CRC
-            decoded_bitstring = hamming_decode_bitstring(received_with_errors, len(encoded_data))
-            decoded_differences_list = huffman_decode_bitstring(decoded_bitstring, huffman_tree)  # Using the inverse Huffman tree
-            # Check and adjust the size of the decoded data before reshaping
-            expected_size = np.prod(differences.shape) # Expected size based on the original differences
-            actual_size = len(decoded_differences_list) # Actual size of the decoded data
-
-
-            # Handle size mismatch: pad with zeros or truncate excess values
-            if actual_size < expected_size:
-                decoded_differences_list += [0] * (expected_size - actual_size) # Add zeros for missing data
-            elif actual_size > expected_size:
-                decoded_differences_list = decoded_differences_list[:expected_size] # Truncate extra data
-             
-             # Rebuild the decompressed image by adding the predictor to the decoded difference
-            decoded_differences = np.array(decoded_differences_list).astype(np.int32).reshape(differences.shape) 
-            decompressed_image = predictor + decoded_differences
-            # Display the original image, compressed data (differences), and the reconstructed decompressed image
-            display_images(image, differences, decompressed_image)
-            ber_after_correction = Calculate_Ber_NO_CRC(encoded_data, decoded_bitstring) # Calculate BER after correction
-
-
-
-            # Check if the decompressed image matches the original image
-            if np.array_equal(image[:, :, :5], decompressed_image):
-                log_output("*** Decompressed image matches the original image ***", bold=True, italic=True, color="green", font_size=16)
-                log_output('')
-
-            else:
-                log_output("*** Decompressed image does not match the original image ***", bold=True, italic=True, color="red", font_size=16)
-
-
-
-
-     # Compression Ratio
-        bits_per_value = differences.dtype.itemsize * 8
-        original_size = len(flat_differences) * bits_per_value
-        compressed_size = len(encoded_data)
-        compression_ratio = original_size / compressed_size
-
-        # Results
-        total_bits = (image.shape[0] * image.shape[1] * image.shape[2])
-        time_per_pixel_ns = (Process_neto_time / total_bits) * 1e9
-        computational_complexity = (1/total_bits) * 1e9
-
-        # Generate textual result
-        results = (
-            f"Compression Ratio: 1:{compression_ratio:.2f}\n"
-            f"BER Before: {ber_before_correction:.10f}\n"
-            f"BER After: {ber_after_correction:.10f}\n"
-            f"Compression Time: {Process_neto_time:.6f} seconds\n"
-            f"Time Per Pixel: {time_per_pixel_ns:.2f} ns"
-        )
-        
-        log_output("Quantitative Requirements:", bold=True, italic=True, font_size=18)
-        log_output(results, bold=True)
 
 
-        # Condition checks and logging
-        log_output("\u2500" * 50)
+    # Summary Table of Quantitative Requirements
+    log('\nSummary Table of Quantitative Requirements:', bold=True, font_size=18, font_name="Courier", italic=True)
+    data = [
+        ["Compression Ratio", f"1:{compression_ratio:.2f}"],
+        ["Max abs error (DN)", f"{error_max}"],
+        [f"PSNR (dB, peak {peak} DN)", f"{psnr_db:.2f}"],
+        ["Spectral angle (degrees)", f"{angle:.5f}"],
+        ["BER after correction", f"{ber_after_correction:.10f}"],
+        ["Compression Time (seconds)", f"{Process_neto_time:.6f}"],
+        ["Time per pixel (ns)", f"{time_per_pixel_ns:.2f}"]
+    ]
 
-        if compression_ratio > 4.0:
-            log_output("Meets the compression ratio requirement: compression ratio > 1:4", italic=True)
-        else:
-            log_output("Does not meet the compression ratio requirement: compression ratio ≤ 1:4", italic=True)
+    table = tabulate(data, headers=["Quantitative Requirement", "Value"], tablefmt="grid")
+    log(table, bold=True)
+    log('-' * 172, bold=True)
 
-        log_output("\u2500" * 50)
 
-        if ber_after_correction < 1e-5:
-            log_output("Meets BER requirement: BER after < 10^-5", italic=True)
-        else:
-            log_output("Does not meet BER requirement: BER after ≥ 10^-5", italic=True)
 
-        log_output("\u2500" * 50)
+# Pipeline Worker: the encode/decode runs in a background thread so the Tk main loop stays responsive
+pipeline_events = queue.Queue()
+cancel_event = threading.Event()
+pipeline_thread = None
 
-        if time_per_pixel_ns <= 216:
-            log_output(f"Meets computational complexity requirement: time per pixel ≤ {computational_complexity:.2f} ns", italic=True)
-        else:
-            log_output(f"Does not meet computational complexity requirement: time per pixel > {computational_complexity:.2f} ns", italic=True)
 
-        log_output("\u2500" * 50)
-        
-        
-        # Final success check
-        if compression_ratio > 4.0 and ber_after_correction < 1e-5 and time_per_pixel_ns <= 216:
-            success_message = "*** The decoder has successfully decoded according to all required conditions! ***"
-            log_output(success_message, bold=True, italic=True, color="green")
-            update_status("Decoding Successful!", bold=True)
-        else:
-            failure_message = "*** The decoder does not meet all the required conditions for successful decoding ***."
-            log_output(failure_message, bold=True, italic=True, color="red")
-            update_status("Decoding may lead to incorrect results. Consider adjusting the parameters.", bold=True)
+def pipeline_worker(image, use_crc, error_rate, max_error):
+    try:
+        run_pipeline(image, use_crc, error_rate, pipeline_events, cancel_event, max_error)
+        pipeline_events.put(("done",))
+    except PipelineCancelled:
+        pipeline_events.put(("cancelled",))
+    except Exception as e:
+        pipeline_events.put(("error", str(e)))
 
-        
-        
-        # Summary Table of Quantitative Requirements
-        log_output('\nSummary Table of Quantitative Requirements:', bold=True, font_size=18, font_name="Courier", italic=True)
-        data = [
-            ["Compression Ratio", f"1:{compression_ratio:.2f}"],
-            ["BER after correction", f"{ber_after_correction:.10f}"],
-            ["Compression Time (seconds)", f"{Process_neto_time:.6f}"],
-            ["Time per pixel (ns)", f"{time_per_pixel_ns:.2f}"]
-        ]
-
-        table = tabulate(data, headers=["Quantitative Requirement", "Value"], tablefmt="grid")
-        log_output(table, bold=True)
-        log_output('-' * 172, bold=True)
 
+def run_process():
+    global pipeline_thread
+    if pipeline_thread is not None and pipeline_thread.is_alive():
+        return  # A run is already in progress
+    try:
+        # Retrieve user-selected options and parameters on the main thread
+        use_crc = crc_var.get()
+        error_rate = int(error_rate_entry.get())
+        max_error = int(max_error_entry.get() or 0)
+        if max_error < 0:
+            raise ValueError("Max error must be a non-negative number of DN.")
+        current_image = image
     except Exception as e:
-        import tkinter.messagebox as messagebox
         messagebox.showerror("Error", str(e))
-    
+        return
+
+    cancel_event.clear()
+    progress_bar.config(maximum=len(PIPELINE_STAGES), value=0)
+    run_button.config(state=tk.DISABLED)
+    cancel_button.config(state=tk.NORMAL)
+    update_status("Running...", bold=True)
+
+    pipeline_thread = threading.Thread(target=pipeline_worker, args=(current_image, use_crc, error_rate, max_error), daemon=True)
+    pipeline_thread.start()
+    root.after(100, poll_pipeline_events)
+
+
+# Function to request cancellation of the running pipeline (takes effect at the next stage boundary or decoding-loop check)
+def cancel_process():
+    cancel_event.set()
+    cancel_button.config(state=tk.DISABLED)
+    update_status("Cancelling...", bold=True)
+
+
+# Drains the worker's event queue on the Tk main thread and reschedules itself while the worker is running
+def poll_pipeline_events():
+    finished = False
+    while True:
+        try:
+            event = pipeline_events.get_nowait()
+        except queue.Empty:
+            break
+        kind = event[0]
+        if kind == "log":
+            log_output(event[1], **event[2])
+        elif kind == "status":
+            update_status(event[1], bold=event[2])
+        elif kind == "progress":
+            progress_bar.config(value=event[1])
+            update_status(f"{PIPELINE_STAGES[event[1]]} ({event[1] + 1}/{len(PIPELINE_STAGES)})", bold=True)
+        elif kind == "display":
+            display_images(*event[1:])
+        elif kind == "done":
+            progress_bar.config(value=len(PIPELINE_STAGES))
+            finished = True
+        elif kind == "cancelled":
+            log_output("*** Process cancelled by the user ***", bold=True, italic=True, color="red")
+            update_status("Cancelled", bold=True)
+            finished = True
+        elif kind == "error":
+            messagebox.showerror("Error", event[1])
+            update_status("Ready", bold=False)
+            finished = True
+
+    if finished:
+        run_button.config(state=tk.NORMAL)
+        cancel_button.config(state=tk.DISABLED)
+    else:
+        root.after(100, poll_pipeline_events)
+
 
 # GUI Window
 root = tk.Tk() # Initialize the main GUI window
@@ -538,8 +468,11 @@ load_button.grid(row=0, column=1, padx=5)
 tk.Label(input_frame, text="Or Create Custom Image:", anchor='w', width=25, bg="#f7f7f7", font=label_font).grid(row=1, column=0, padx=5)
 dimensions_entry = tk.Entry(input_frame, font=label_font)
 dimensions_entry.grid(row=1, column=1, padx=5, pady=5)
+tk.Label(input_frame, text="Seed (optional):", anchor='w', width=25, bg="#f7f7f7", font=label_font).grid(row=2, column=0, padx=5)
+seed_entry = tk.Entry(input_frame, font=label_font)
+seed_entry.grid(row=2, column=1, padx=5, pady=5)
 create_button = tk.Button(input_frame, text="Create Image", command=create_custom_image, font=button_font, bg="#ff9800", fg="white", relief="raised")
-create_button.grid(row=2, column=1, padx=5, pady=5)
+create_button.grid(row=3, column=1, padx=5, pady=5)
 
 # Create a labeled frame for CRC selection
 crc_frame = tk.LabelFrame(frame_inputs, text="CRC Settings", padx=20, pady=20, font=("Arial", 14, "bold"), bg="#f7f7f7")
@@ -566,6 +499,20 @@ error_rate_entry.grid(row=0, column=1, padx=5, pady=5)
 
 
 
+# Create a labeled frame for the compression mode (0 = lossless, > 0 = near-lossless)
+mode_frame = tk.LabelFrame(frame_inputs, text="Compression Mode", padx=20, pady=20, font=("Arial", 14, "bold"), bg="#f7f7f7")
+mode_frame.grid(row=3, column=0, padx=10, pady=10, sticky="ew")
+mode_frame.columnconfigure(1, weight=1)
+
+# Add a label and entry field for the maximum absolute error per pixel
+tk.Label(mode_frame, text="Max Abs Error (DN, 0=lossless):", anchor='w', width=25, bg="#f7f7f7", font=label_font).grid(row=0, column=0, padx=5)
+max_error_entry = tk.Entry(mode_frame, font=label_font)
+max_error_entry.insert(0, "0")
+max_error_entry.grid(row=0, column=1, padx=5, pady=5)
+
+
+
+
 # Define hover effect for the "Run Process" button
 def on_enter(event):
     event.widget.config(bg="#45a049") # Change button background color when the mouse hovers over it
@@ -576,7 +523,7 @@ def on_leave(event):
 
 # Create a frame for the Run button
 run_button_frame = tk.Frame(frame_inputs, bg="#f7f7f7") # Frame to organize the "Run Process" button
-run_button_frame.grid(row=3, column=0, padx=10, pady=20, sticky="ew") # Place the frame in the grid layout
+run_button_frame.grid(row=4, column=0, padx=10, pady=20, sticky="ew") # Place the frame in the grid layout
 
 # Add the "Run Process" button
 run_button = tk.Button(run_button_frame, text="Run Process", command=run_process, font=button_font, bg="#4CAF50", fg="white", relief="raised")
@@ -592,26 +539,45 @@ status_label.pack(pady=10)
 
 
 # Dedicated Display Window
-def display_images(image, differences, decompressed_image):
-    bands_to_show = [0, 1, 2, 3, 4] # Select the first 5 spectral bands for visualization
-    plt.figure(figsize=(12, 8)) # Create a figure with the specified size
+# A single preview figure is created once and its images are updated in place on every run.
+# Bands are decimated to at most PREVIEW_MAX_SIZE pixels per side before drawing.
+PREVIEW_MAX_SIZE = 256
+preview_figure = None
+preview_artists = None
 
-    for i, band in enumerate(bands_to_show):
-        # Display the original image for the current band
-        plt.subplot(3, 5, i + 1)
-        plt.imshow(image[:, :, band], cmap='gray')
-        plt.title(f'Original (Band {band})', fontsize=10)
 
-        plt.subplot(3, 5, i + 6)
-        plt.imshow(differences[:, :, band], cmap='gray')
-        plt.title(f'Compressed (Band {band})', fontsize=10)
+def decimate_band(band_image):
+    step = max(1, -(-max(band_image.shape[:2]) // PREVIEW_MAX_SIZE))
+    return band_image[::step, ::step]
 
-        plt.subplot(3, 5, i + 11)
-        plt.imshow(decompressed_image[:, :, band], cmap='gray')
-        plt.title(f'Decompressed (Band {band})', fontsize=10)
 
-    plt.tight_layout()
-    plt.draw()  # Render the plot without blocking the program
+def display_images(image, differences, decompressed_image):
+    global preview_figure, preview_artists
+    bands_to_show = [0, 1, 2, 3, 4] # Select the first 5 spectral bands for visualization
+    rows = [("Original", image), ("Compressed", differences), ("Decompressed", decompressed_image)]
+
+    # Create the figure only once (or again if the user closed it)
+    if preview_figure is None or not plt.fignum_exists(preview_figure.number):
+        preview_figure, axes = plt.subplots(3, 5, figsize=(12, 8))
+        preview_artists = []
+        for r, (title, data) in enumerate(rows):
+            for i, band in enumerate(bands_to_show):
+                axes[r, i].set_title(f'{title} (Band {band})', fontsize=10)
+                preview_artists.append(axes[r, i].imshow(decimate_band(data[:, :, band]), cmap='gray'))
+        preview_figure.tight_layout()
+    else:
+        artists = iter(preview_artists)
+        for title, data in rows:
+            for band in bands_to_show:
+                artist = next(artists)
+                band_image = decimate_band(data[:, :, band])
+                artist.set_data(band_image)
+                artist.set_extent((-0.5, band_image.shape[1] - 0.5, band_image.shape[0] - 0.5, -0.5))
+                artist.axes.set_xlim(-0.5, band_image.shape[1] - 0.5)
+                artist.axes.set_ylim(band_image.shape[0] - 0.5, -0.5)
+                artist.set_clim(band_image.min(), band_image.max())
+
+    preview_figure.canvas.draw_idle()  # Render the plot without blocking the program
     plt.pause(0.001)  # Pause briefly to allow the GUI to remain responsive
 
 
@@ -626,6 +592,14 @@ def restart_process():
 Clear_button = tk.Button(run_button_frame, text="Clear", command=restart_process, font=button_font, bg="#f44336", fg="white", relief="flat")
 Clear_button.grid(row=0, column=1, padx=5, pady=5)
 
+# Add a "Cancel" button that stops a running process at the next stage
+cancel_button = tk.Button(run_button_frame, text="Cancel", command=cancel_process, font=button_font, bg="gray", fg="white", relief="flat", state=tk.DISABLED)
+cancel_button.grid(row=0, column=2, padx=5, pady=5)
+
+# Add a progress bar showing the current pipeline stage
+progress_bar = ttk.Progressbar(run_button_frame, orient="horizontal", mode="determinate", length=300, maximum=len(PIPELINE_STAGES))
+progress_bar.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky="ew")
+
 
 
 # Function to update the status label with a given message
@@ -653,6 +627,11 @@ def log_output(message, bold=False, italic=False, color="black", font_name="Cour
 
 
 
+# Compile (or load from cache) the JIT kernels in the background so the first run does not pay the compile latency
+log_output(f"Compute backend: {get_backend()}")
+threading.Thread(target=warmup_kernels, daemon=True).start()
+
+
 # Start the GUI Main Loop
 root.mainloop()
 
@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import glob
+import numpy as np
+import huffman
+import spectral
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from codec import (
+    near_lossless_encode, near_lossless_decode, zigzag_encode, zigzag_decode, residual_frequencies, sample_bit_depth,
+    huffman_encode_bitstring, huffman_decode_bitstring, max_abs_error, data_peak, sample_range, ns_per_sample
+)
+from predictor_evaluation import load_scene
+from kernels import warmup_kernels
+
+
+# Batch archive pipeline for directories of hyperspectral scenes (.lan and ENVI .hdr).
+# Every scene is compressed band group by band group (5 bands, the codec's unit) with the closed-loop predictor,
+# so the archive can be decoded without the original (max_error=0 is lossless, > 0 is near-lossless).
+# Scenes run in a bounded process pool, and new scenes are only submitted while the estimated size of the
+# scenes in flight stays under a memory budget. A JSON-lines manifest in the output directory records the
+# metrics of every scene and is used to skip scenes that were already processed.
+
+
+SCENE_PATTERNS = ("*.lan", "*.hdr")
+MANIFEST_NAME = "manifest.jsonl"
+BAND_GROUP = 5  # Bands coded together by the predictor
+
+
+# Lists the scene files of a directory, in a stable order. Files modified less than settle_seconds ago
+# are left for a later scan, since they may still be being written.
+def find_scenes(input_dir, settle_seconds=0):
+    paths = []
+    for pattern in SCENE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(input_dir, pattern)))
+    now = time.time()
+    return sorted(path for path in paths if now - os.path.getmtime(path) >= settle_seconds)
+
+
+# In-memory size (bytes) of a scene, read from its header without loading the data
+def scene_nbytes(path):
+    scene = spectral.open_image(path)
+    return scene.nrows * scene.ncols * scene.nbands * np.dtype(scene.dtype).itemsize
+
+
+# Identifies a version of a scene file so that replaced files are processed again
+# (for ENVI scenes the data file is checked, not the header)
+def scene_signature(path):
+    data_path = spectral.open_image(path).filename if path.lower().endswith(".hdr") else path
+    stat = os.stat(data_path)
+    return {"scene": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+# Archive file of a scene; the scene's extension is kept so that e.g. scene.lan and scene.hdr do not collide
+def archive_path(path, output_dir):
+    return os.path.join(output_dir, os.path.basename(path) + ".npz")
+
+
+# Casts a reconstruction back to the scene's sample dtype, clipping first so out-of-range values cannot wrap
+def to_scene_dtype(reconstructed, dtype):
+    return np.clip(reconstructed, *sample_range(dtype)).astype(dtype)
+
+
+# Manifest records keyed by scene path; a scene is done if its signature matches and either its archive still exists
+# or it failed to compress (failure records carry an "error" instead of an archive and are retried only once the
+# scene file changes)
+def read_manifest(output_dir):
+    records = {}
+    manifest = os.path.join(output_dir, MANIFEST_NAME)
+    if os.path.exists(manifest):
+        with open(manifest) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    records[record["scene"]] = record
+    return records
+
+
+def is_processed(path, output_dir, records):
+    record = records.get(os.path.abspath(path))
+    signature = scene_signature(path)
+    return (record is not None and record["size"] == signature["size"] and record["mtime"] == signature["mtime"]
+            and ("error" in record or os.path.exists(record["archive"])))
+
+
+def append_manifest(output_dir, record):
+    with open(os.path.join(output_dir, MANIFEST_NAME), "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+# Compresses one scene into an .npz archive (one Huffman code and one packed bitstring per band group)
+# and returns its metrics record for the manifest. Only integer scenes are accepted: float cubes (e.g. reflectance)
+# would be truncated by the integer codec, so they must be quantized to integers beforehand.
+def compress_scene(path, output_dir, max_error=0):
+    warmup_kernels()  # Keep the JIT compile / cache-load latency out of the measured time
+    start_time = time.time()
+    image = load_scene(path)
+    if not np.issubdtype(image.dtype, np.integer):
+        raise ValueError(f"{path} has {image.dtype} samples; only integer scenes can be archived.")
+    rows, cols, bands = image.shape
+    arrays = {}
+    compressed_bits = 0
+    worst_error = 0
+    squared_error = 0.0
+    metrics_seconds = 0.0  # Time spent on the quality metrics, excluded from the compression time
+
+    for group, first_band in enumerate(range(0, bands, BAND_GROUP)):
+        cube = image[:, :, first_band:first_band + BAND_GROUP]
+        quantized, _ = near_lossless_encode(cube, max_error)
+        flat_symbols = zigzag_encode(quantized).ravel()
+        huffman_tree = huffman.codebook(residual_frequencies(flat_symbols))
+        if len(huffman_tree) == 1:
+            huffman_tree = {symbol: '0' for symbol in huffman_tree}  # A constant band group still needs one bit per sample
+        encoded_data = np.asarray(huffman_encode_bitstring(flat_symbols, huffman_tree), dtype=np.uint8)
+
+        symbols = sorted(huffman_tree)
+        arrays[f"symbols_{group}"] = np.array(symbols, dtype=np.uint32)
+        arrays[f"codes_{group}"] = np.array([huffman_tree[symbol] for symbol in symbols])
+        arrays[f"bits_{group}"] = np.packbits(encoded_data)
+        arrays[f"nbits_{group}"] = np.array(len(encoded_data))
+        compressed_bits += len(encoded_data)
+
+        # Metrics against the decoded band group, as decompress_scene returns it (the Huffman stage is lossless)
+        metrics_start = time.time()
+        decoded = to_scene_dtype(near_lossless_decode(quantized, max_error, image.dtype), image.dtype)
+        worst_error = max(worst_error, max_abs_error(cube, decoded))
+        squared_error += float(np.sum((cube.astype(np.float64) - decoded) ** 2))
+        metrics_seconds += time.time() - metrics_start
+
+    bits_per_value = sample_bit_depth(image)
+    output = archive_path(path, output_dir)
+    np.savez(output, shape=np.array(image.shape), dtype=np.array(image.dtype.str), max_error=np.array(max_error), **arrays)
+    elapsed = time.time() - start_time - metrics_seconds
+
+    mse = squared_error / image.size
+    record = scene_signature(path)
+    record.update({
+        "archive": os.path.abspath(output),
+        "rows": rows, "cols": cols, "bands": bands,
+        "max_error": max_error,
+        "compressed_bits": compressed_bits,
+        "bits_per_sample": compressed_bits / image.size,
+        "compression_ratio": image.size * bits_per_value / compressed_bits,
+        "max_abs_error": worst_error,
+        "psnr_peak": data_peak(image),  # PSNR peak: dynamic range of the scene's samples
+        "psnr_db": None if mse == 0 else float(10 * np.log10(data_peak(image) ** 2 / mse)),
+        "seconds": elapsed,
+        "ns_per_pixel": ns_per_sample(elapsed, image.size),  # Every band is coded
+    })
+    return record
+
+
+# Decodes an archive written by compress_scene back into a (rows, cols, bands) cube
+def decompress_scene(archive):
+    data = np.load(archive)
+    rows, cols, bands = data["shape"]
+    max_error = int(data["max_error"])
+    image = np.empty((rows, cols, bands), dtype=np.dtype(str(data["dtype"])))
+    for group, first_band in enumerate(range(0, bands, BAND_GROUP)):
+        group_bands = min(BAND_GROUP, bands - first_band)
+        huffman_tree = dict(zip(data[f"symbols_{group}"].tolist(), data[f"codes_{group}"].tolist()))
+        encoded_data = np.unpackbits(data[f"bits_{group}"])[:int(data[f"nbits_{group}"])]
+        decoded = huffman_decode_bitstring(encoded_data, huffman_tree)
+        quantized = zigzag_decode(decoded).reshape(rows, cols, group_bands)
+        image[:, :, first_band:first_band + group_bands] = to_scene_dtype(near_lossless_decode(quantized, max_error, image.dtype), image.dtype)
+    return image
+
+
+# Compresses every unprocessed scene of input_dir with at most `workers` processes and at most
+# max_inflight_bytes of scene data in flight (a single larger scene is still processed on its own).
+# Returns the manifest records written during this call.
+def run_batch(input_dir, output_dir, workers=None, max_inflight_bytes=2 * 1024 ** 3, max_error=0, settle_seconds=0,
+              log=print):
+    os.makedirs(output_dir, exist_ok=True)
+    records = read_manifest(output_dir)
+    written = []
+    pending = []
+    sizes = {}
+    for path in find_scenes(input_dir, settle_seconds):
+        # An unreadable (e.g. partially written) header only skips that scene; it is retried on the next scan
+        try:
+            if is_processed(path, output_dir, records):
+                continue
+            sizes[path] = scene_nbytes(path)
+        except Exception as e:
+            log(f"Skipping {path}: {e}")
+            continue
+        pending.append(path)
+    if not pending:
+        return written
+
+    start_time = time.time()
+    in_flight = {}
+    inflight_bytes = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while pending or in_flight:
+            # Submit while the memory budget allows (always allow one scene when nothing is running)
+            while pending:
+                size = sizes[pending[0]]
+                if in_flight and inflight_bytes + size > max_inflight_bytes:
+                    break
+                path = pending.pop(0)
+                in_flight[pool.submit(compress_scene, path, output_dir, max_error)] = (path, size)
+                inflight_bytes += size
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, size = in_flight.pop(future)
+                inflight_bytes -= size
+                try:
+                    record = future.result()
+                except Exception as e:
+                    log(f"Failed to compress {path}: {e} (skipped until the file changes)")
+                    try:
+                        append_manifest(output_dir, dict(scene_signature(path), error=str(e)))
+                    except Exception:
+                        pass  # The scene can no longer be read; it is retried on the next scan
+                    continue
+                append_manifest(output_dir, record)
+                written.append(record)
+                log(f"{os.path.basename(path)}: ratio 1:{record['compression_ratio']:.2f}, {record['seconds']:.1f} s")
+
+    elapsed = time.time() - start_time
+    log(f"Processed {len(written)} scenes in {elapsed:.1f} s ({len(written) / elapsed * 3600:.1f} scenes/hour)")
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+    import warnings
+    warnings.filterwarnings("ignore")
+
+    parser = argparse.ArgumentParser(description="Compress a directory of hyperspectral scenes (.lan / ENVI .hdr).")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--max-inflight-mb", type=float, default=2048, help="Scene data allowed in flight (MB)")
+    parser.add_argument("--max-error", type=int, default=0, help="Maximum absolute error per sample (0 = lossless)")
+    parser.add_argument("--watch", type=float, default=None, metavar="SECONDS",
+                        help="Keep scanning the input directory every SECONDS for new scenes")
+    args = parser.parse_args()
+
+    while True:
+        run_batch(args.input_dir, args.output_dir, args.workers, args.max_inflight_mb * 1024 ** 2, args.max_error,
+                  settle_seconds=args.watch or 0)
+        if args.watch is None:
+            break
+        time.sleep(args.watch)
@@ -0,0 +1,324 @@
+import math
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+import huffman
+from codec import (
+    CRC_BITS, compute_residuals, zigzag_encode, residual_frequencies, sample_bit_depth, ns_per_sample, huffman_encode_bitstring,
+    crc_hamming_encode, crc_hamming_decode_and_validate, hamming_encode_vectorized, hamming_decode_bitstring,
+    introduce_errors, bsc_errors, burst_errors, interleave, deinterleave
+)
+from predictors import predictors
+from kernels import warmup_kernels
+
+
+# Automatic code-parameter optimizer.
+# Given a channel description and targets for BER, compression ratio and ns/pixel, it searches the predictors,
+# FEC (none / Hamming (7,4)), CRC and block-interleaver depths for the configuration with the fewest transmitted
+# bits that meets every requirement:
+#   1. The source stage (predictor + Huffman) runs once per predictor and image and is cached; predictors that miss
+#      the ratio or ns/pixel targets are dropped.
+#   2. Channel configurations that analytically cannot reach the targets are pruned before any simulation. On a
+#      binary symmetric channel a true lower bound on the decoded BER is used where one exists (no FEC, Hamming
+#      without CRC). The other estimates (CRC, burst channels at their average flip rate) are not bounds, so they
+#      only prune when they miss a target by PRUNE_MARGIN. The periodic (GUI) channel caps the errors per window,
+#      which the memoryless formulas do not model, so it is never pruned analytically.
+#   3. The survivors are simulated in order of transmitted bits. Each one is simulated repeatedly (fresh channel
+#      realizations) until a one-sided confidence bound decides it: it meets a target only when the upper bound is
+#      below it, and misses when the lower bound is above it. The first one that meets all targets wins; a
+#      candidate still undecided after max_simulated_bits source bits is reported as inconclusive.
+
+
+FEC_OPTIONS = ["none", "hamming74"]
+CRC_OPTIONS = ["NO", "YES"]
+INTERLEAVER_DEPTHS = [1, 7, 28, 112, 448]
+PRUNE_MARGIN = 100.0  # Factor by which an estimate that is not a lower bound must miss a target to prune
+CONFIDENCE_Z = 1.645  # One-sided 95% confidence for the simulated BER and lost-block rates
+MAX_SIMULATED_BITS = 1 << 23  # Source bits simulated per candidate before giving up as inconclusive
+CRC_BLOCK_DATA_BITS = 13  # Data bits per CRC block (13 data + 3 CRC bits = 4 Hamming codewords)
+
+DEFAULT_TARGETS = {"ber": 1e-5, "ratio": 4.0, "ns_per_pixel": 216.0, "lost_blocks": 1e-3}
+
+
+# Channel descriptions
+def bsc_channel(flip_probability):
+    return {"model": "bsc", "flip_probability": flip_probability}
+
+
+def burst_channel(p_good_to_bad, p_bad_to_good, p_bad, p_good=0.0):
+    return {"model": "burst", "p_good_to_bad": p_good_to_bad, "p_bad_to_good": p_bad_to_good,
+            "p_bad": p_bad, "p_good": p_good}
+
+
+# The GUI's error model: one flipped bit in every error_rate bits
+def periodic_channel(error_rate):
+    return {"model": "periodic", "error_rate": error_rate}
+
+
+# Long-run fraction of flipped bits on the channel
+def average_flip_probability(channel):
+    if channel["model"] == "bsc":
+        return channel["flip_probability"]
+    if channel["model"] == "periodic":
+        return 1.0 / channel["error_rate"] if channel["error_rate"] else 0.0
+    p_bad_state = channel["p_good_to_bad"] / (channel["p_good_to_bad"] + channel["p_bad_to_good"])
+    return p_bad_state * channel["p_bad"] + (1 - p_bad_state) * channel["p_good"]
+
+
+def apply_channel(bitstring, channel, rng):
+    if channel["model"] == "bsc":
+        return bsc_errors(bitstring, channel["flip_probability"], rng)
+    if channel["model"] == "periodic":
+        return introduce_errors(bitstring, channel["error_rate"], rng)
+    return burst_errors(bitstring, channel["p_good_to_bad"], channel["p_bad_to_good"], channel["p_bad"],
+                        channel["p_good"], rng)
+
+
+# Analytic estimates on a memoryless channel with flip probability p
+
+# Probability that a Hamming (7,4) codeword has more errors than it can correct
+def hamming74_codeword_failure(p):
+    return 1 - (1 - p) ** 7 - 7 * p * (1 - p) ** 6
+
+
+# Decoded bit error rate of Hamming (7,4): (1/n) * sum_{i>=2} min(i + 1, n) * C(n, i) p^i (1-p)^(n-i)
+def hamming74_bit_error(p):
+    return sum(min(i + 1, 7) * math.comb(7, i) * p ** i * (1 - p) ** (7 - i) for i in range(2, 8)) / 7
+
+
+# Returns (estimated BER after decoding, estimated fraction of CRC blocks dropped)
+def estimate_channel(p, fec, crc):
+    if fec == "none":
+        return p, 0.0
+    if crc == "NO":
+        return hamming74_bit_error(p), 0.0
+    block_failure = 1 - (1 - hamming74_codeword_failure(p)) ** 4
+    # A failed block passes the 3-bit CRC with probability about 2^-3, otherwise it is dropped
+    undetected = 2.0 ** -CRC_BITS
+    return hamming74_bit_error(p) * undetected, block_failure * (1 - undetected)
+
+
+# Lower bound on the decoded BER on a binary symmetric channel, or None when there is no useful one.
+# Without FEC the BER is p. Hamming (7,4) decodes a codeword with 2 or more errors to a wrong codeword, which has
+# at least one wrong data bit out of 4. Errors left undetected by the CRC have no useful lower bound.
+def ber_lower_bound(p, fec, crc):
+    if fec == "none":
+        return p
+    if crc == "NO":
+        return hamming74_codeword_failure(p) / 4
+    return None
+
+
+# Number of transmitted bits for a source bitstring of n bits
+def transmitted_length(n, fec, crc, depth):
+    if fec == "none":
+        length = n
+    elif crc == "YES":
+        length = math.ceil(n / CRC_BLOCK_DATA_BITS) * 28
+    else:
+        length = math.ceil(n / 4) * 7
+    return length if depth <= 1 else math.ceil(length / depth) * depth
+
+
+# Identity of an image for the source cache: shape, dtype and a digest of the samples
+def image_key(image):
+    image = np.ascontiguousarray(image)
+    return image.shape, image.dtype.str, hashlib.blake2b(image.data, digest_size=16).hexdigest()
+
+
+# Source stage (predictor + Huffman) for one predictor; cached by image and predictor name
+def source_encode(image, predictor_name, source_cache=None):
+    key = (image_key(image), predictor_name)
+    if source_cache is not None and key in source_cache:
+        return source_cache[key]
+
+    warmup_kernels()  # Keep the JIT compile / cache-load latency out of the measured time
+    start_time = time.time()
+    predictor = predictors[predictor_name](image)
+    differences = compute_residuals(image, predictor)
+    flat_symbols = zigzag_encode(differences).ravel()
+    huffman_tree = huffman.codebook(residual_frequencies(flat_symbols))
+    if len(huffman_tree) == 1:
+        huffman_tree = {symbol: '0' for symbol in huffman_tree}  # A constant source still needs one bit per sample
+    encoded_data = huffman_encode_bitstring(flat_symbols, huffman_tree)
+    elapsed = time.time() - start_time
+
+    result = {
+        "encoded_data": encoded_data,
+        "samples": len(flat_symbols),
+        "compression_ratio": len(flat_symbols) * sample_bit_depth(image) / len(encoded_data),
+        # Same definition as the GUI (codec.ns_per_sample): source coding time per coded sample
+        "ns_per_pixel": ns_per_sample(elapsed, len(flat_symbols)),
+    }
+    if source_cache is not None:
+        source_cache[key] = result
+    return result
+
+
+# One-sided Wilson score bounds (lower, upper) of a rate observed as `events` out of `trials`.
+# The bounds assume independent trials; on a burst channel the errors are correlated, so they are optimistic
+# unless the interleaver spreads the bursts.
+def wilson_bounds(events, trials, z=CONFIDENCE_Z):
+    if trials == 0:
+        return 0.0, 1.0
+    rate = events / trials
+    denominator = 1 + z ** 2 / trials
+    centre = (rate + z ** 2 / (2 * trials)) / denominator
+    half_width = z * math.sqrt(rate * (1 - rate) / trials + z ** 2 / (4 * trials ** 2)) / denominator
+    return max(centre - half_width, 0.0), min(centre + half_width, 1.0)
+
+
+# Channel stage: FEC/CRC encoding, interleaving, channel, deinterleaving and decoding for one channel realization.
+# Returns (bit errors, compared bits, dropped CRC blocks, CRC blocks).
+def simulate_channel(encoded_data, channel, fec, crc, depth, rng):
+    if fec == "none":
+        coded = encoded_data
+    elif crc == "YES":
+        coded = crc_hamming_encode(encoded_data)
+    else:
+        coded = hamming_encode_vectorized(encoded_data)
+
+    received = deinterleave(apply_channel(interleave(coded, depth), channel, rng), depth, len(coded))
+
+    if fec == "none":
+        return int(np.sum(encoded_data != received)), len(encoded_data), 0, 0
+    if crc == "YES":
+        decoded, valid_indices, valid_blocks, invalid_blocks = crc_hamming_decode_and_validate(received)
+        # Same comparison as Calculate_Ber_After_CRC: the bits of the valid blocks, without the padding
+        valid_indices = np.asarray(valid_indices, dtype=np.int64)
+        valid_indices = valid_indices[valid_indices < len(encoded_data)]
+        errors = int(np.sum(encoded_data[valid_indices] != decoded[:len(valid_indices)]))
+        return errors, len(valid_indices), invalid_blocks, valid_blocks + invalid_blocks
+    decoded = hamming_decode_bitstring(received, len(encoded_data))
+    return int(np.sum(encoded_data != decoded)), len(encoded_data), 0, 0
+
+
+# Simulates one candidate until the confidence bounds decide it against the BER and lost-block targets.
+# Returns (verdict: "meets" / "misses" / "inconclusive", BER, BER upper bound, lost-block rate, simulated bits).
+def simulate_candidate(encoded_data, channel, fec, crc, depth, targets, rng, max_simulated_bits=MAX_SIMULATED_BITS):
+    errors = compared = lost = blocks = simulated = 0
+    while True:
+        round_errors, round_compared, round_lost, round_blocks = simulate_channel(encoded_data, channel, fec, crc, depth, rng)
+        errors += round_errors
+        compared += round_compared
+        lost += round_lost
+        blocks += round_blocks
+        simulated += len(encoded_data)
+
+        ber_low, ber_high = wilson_bounds(errors, compared)
+        lost_low, lost_high = wilson_bounds(lost, blocks) if crc == "YES" and fec != "none" else (0.0, 0.0)
+        if ber_low > targets["ber"] or lost_low > targets["lost_blocks"]:
+            verdict = "misses"
+        elif ber_high < targets["ber"] and lost_high <= targets["lost_blocks"]:
+            verdict = "meets"
+        elif simulated >= max_simulated_bits:
+            verdict = "inconclusive"
+        else:
+            continue
+        return verdict, errors / max(compared, 1), ber_high, lost / max(blocks, 1), simulated
+
+
+# Searches for the configuration with the fewest transmitted bits that meets every target.
+# Returns (best configuration as a dict, or None if nothing qualifies, table of every candidate).
+# Pass the same source_cache dict to repeated calls to reuse the source-coding output across channels.
+def optimize_code_parameters(image, channel, targets=None, predictor_names=None, source_cache=None, seed=None,
+                             max_simulated_bits=MAX_SIMULATED_BITS):
+    targets = dict(DEFAULT_TARGETS, **(targets or {}))
+    predictor_names = list(predictors) if predictor_names is None else list(predictor_names)
+    source_cache = {} if source_cache is None else source_cache
+    memoryless = channel["model"] in ("bsc", "periodic")
+    p = average_flip_probability(channel)
+    rng = np.random.default_rng(seed)
+
+    candidates = []
+    for name in predictor_names:
+        source = source_encode(image, name, source_cache)
+        source_ok = source["compression_ratio"] >= targets["ratio"] and source["ns_per_pixel"] <= targets["ns_per_pixel"]
+        for fec in FEC_OPTIONS:
+            for crc in CRC_OPTIONS:
+                if fec == "none" and crc == "YES":
+                    continue  # CRC blocks are only defined on top of the Hamming code
+                ber_estimate, lost_estimate = estimate_channel(p, fec, crc)
+                ber_bound = ber_lower_bound(p, fec, crc) if channel["model"] == "bsc" else None
+                for depth in INTERLEAVER_DEPTHS:
+                    if not source_ok:
+                        status = "source misses ratio/time target"
+                    elif memoryless and depth > 1:
+                        status = "pruned: interleaving cannot help a memoryless channel"
+                    elif fec == "none" and depth > 1:
+                        status = "pruned: interleaving needs an FEC code"
+                    elif channel["model"] == "periodic":
+                        status = "to simulate"
+                    elif ber_bound is not None and ber_bound > targets["ber"]:
+                        status = "pruned: analytic lower bound misses target"
+                    elif ber_estimate > targets["ber"] * PRUNE_MARGIN or lost_estimate > targets["lost_blocks"] * PRUNE_MARGIN:
+                        status = "pruned: analytic estimate misses target by a wide margin"
+                    else:
+                        status = "to simulate"
+                    candidates.append({
+                        "Predictor": name, "FEC": fec, "CRC": crc, "Interleaver depth": depth,
+                        "Transmitted bits": transmitted_length(len(source["encoded_data"]), fec, crc, depth),
+                        "Compression Ratio": source["compression_ratio"], "ns/pixel": source["ns_per_pixel"],
+                        "BER estimate": ber_estimate, "BER simulated": np.nan, "BER upper bound": np.nan,
+                        "Lost blocks": np.nan, "Simulated bits": 0, "Status": status,
+                    })
+
+    # Simulate the surviving candidates, cheapest first, until one meets every requirement
+    table = pd.DataFrame(candidates).sort_values("Transmitted bits", kind="stable").reset_index(drop=True)
+    best = None
+    for index in table.index[table["Status"] == "to simulate"]:
+        row = table.loc[index]
+        verdict, ber, ber_high, lost, simulated = simulate_candidate(
+            source_encode(image, row["Predictor"], source_cache)["encoded_data"], channel, row["FEC"], row["CRC"],
+            row["Interleaver depth"], targets, rng, max_simulated_bits)
+        table.loc[index, ["BER simulated", "BER upper bound", "Lost blocks", "Simulated bits"]] = [ber, ber_high, lost, simulated]
+        if verdict == "meets":
+            table.loc[index, "Status"] = "selected"
+            best = table.loc[index].to_dict()
+            break
+        table.loc[index, "Status"] = ("simulated: misses target" if verdict == "misses"
+                                      else "simulated: inconclusive (simulation budget reached)")
+    table.loc[table["Status"] == "to simulate", "Status"] = "not needed"
+    return best, table
+
+
+if __name__ == "__main__":
+    import argparse
+    import warnings
+    from predictor_evaluation import load_scene
+    warnings.filterwarnings("ignore")
+
+    parser = argparse.ArgumentParser(description="Find the cheapest predictor/FEC/CRC/interleaver configuration for a channel.")
+    parser.add_argument("scene", nargs="?", default="92AV3C.lan", help="Scene file (.lan or ENVI .hdr)")
+    channel_group = parser.add_mutually_exclusive_group(required=True)
+    channel_group.add_argument("--flip-probability", type=float, help="Binary symmetric channel flip probability")
+    channel_group.add_argument("--burst", type=float, nargs=3, metavar=("P_GOOD_TO_BAD", "P_BAD_TO_GOOD", "P_BAD"),
+                               help="Gilbert-Elliott burst channel parameters")
+    channel_group.add_argument("--error-rate", type=int, help="One flipped bit every N bits (as in the GUI)")
+    parser.add_argument("--ber", type=float, default=DEFAULT_TARGETS["ber"])
+    parser.add_argument("--ratio", type=float, default=DEFAULT_TARGETS["ratio"])
+    parser.add_argument("--ns-per-pixel", type=float, default=DEFAULT_TARGETS["ns_per_pixel"])
+    parser.add_argument("--lost-blocks", type=float, default=DEFAULT_TARGETS["lost_blocks"])
+    parser.add_argument("--predictors", nargs="+", default=None, choices=list(predictors), metavar="NAME")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-simulated-bits", type=int, default=MAX_SIMULATED_BITS,
+                        help="Source bits simulated per candidate before it is reported as inconclusive")
+    parser.add_argument("--output", default=None, help="Write the candidate table to a .csv file")
+    args = parser.parse_args()
+
+    if args.flip_probability is not None:
+        channel = bsc_channel(args.flip_probability)
+    elif args.burst is not None:
+        channel = burst_channel(*args.burst)
+    else:
+        channel = periodic_channel(args.error_rate)
+    targets = {"ber": args.ber, "ratio": args.ratio, "ns_per_pixel": args.ns_per_pixel, "lost_blocks": args.lost_blocks}
+
+    best, table = optimize_code_parameters(load_scene(args.scene), channel, targets, args.predictors, seed=args.seed,
+                                           max_simulated_bits=args.max_simulated_bits)
+    print(table.to_string(index=False))
+    print()
+    print(f"Best configuration: {best}" if best else "No configuration meets every requirement.")
+    if args.output:
+        table.to_csv(args.output, index=False)
@@ -0,0 +1,456 @@
+import numpy as np
+import random
+from kernels import register_kernel
+
+
+# Source and channel coding functions shared by the GUI and the command-line tools:
+# integer residuals and zig-zag symbols, Huffman bitstrings, CRC and Hamming (7,4) coding, error injection and BER.
+# Functions decorated with @register_kernel dispatch to the active compute backend (see kernels.py).
+
+
+# Constants for CRC
+CRC_POLY = 0b1011
+CRC_BITS = 3
+
+
+# Hamming matrices for (7,4) code
+G = np.array([[1, 0, 0, 0, 1, 1, 0],
+              [0, 1, 0, 0, 1, 0, 1],
+              [0, 0, 1, 0, 1, 1, 1],
+              [0, 0, 0, 1, 0, 1, 1]])
+
+H = np.array([[1, 1, 1, 0, 1, 0, 0],
+              [1, 0, 1, 1, 0, 1, 0],
+              [0, 1, 1, 1, 0, 0, 1]])
+
+
+
+# CRC Encoding function
+@register_kernel("crc_encode")
+def crc_encode(data):
+    data = np.concatenate([data, [0] * CRC_BITS])  # This prepares the data for CRC calculation by appending 3 zeros for CRC bits.
+    for i in range(len(data) - CRC_BITS):
+        if data[i]:
+            for j in range(CRC_BITS + 1):
+                data[i + j] ^= (CRC_POLY >> (CRC_BITS - j)) & 1
+    return data[-CRC_BITS:]
+
+
+
+# CRC Check function
+@register_kernel("crc_check")
+def crc_check(data): # Checks whether the CRC bits in the data are valid
+    check = np.copy(data)
+    for i in range(len(check) - CRC_BITS):
+        if check[i]:
+            for j in range(CRC_BITS + 1):
+                check[i + j] ^= (CRC_POLY >> (CRC_BITS - j)) & 1
+    return not any(check[-CRC_BITS:])
+
+
+
+# Hamming Encoding function
+def hamming_encode_vectorized(bitstring):
+    bitstring = np.pad(bitstring, (0, (4 - len(bitstring) % 4) % 4), 'constant')
+    bitstring = np.reshape(bitstring, (-1, 4))
+    encoded_bitstring = (np.dot(bitstring, G) % 2).reshape(-1)
+    return encoded_bitstring
+
+
+
+# Hamming Decoding function
+def hamming_decode_7bit(received_block):
+    syndrome = np.dot(received_block, H.T) % 2
+    if np.any(syndrome):
+        error_position = np.where((H.T == syndrome).all(axis=1))[0][0]
+        received_block[error_position] ^= 1
+    return received_block[:4]
+
+
+
+# Function to encode using CRC and Hamming
+def crc_hamming_encode(bitstring):
+    # Step 1: Pad the bitstring to make its length a multiple of 13
+    padding_length = (13 - len(bitstring) % 13) % 13     
+    bitstring = np.pad(bitstring, (0, padding_length), 'constant')
+ 
+    # Step 2: Split the bitstring into blocks of 13 bits and extend them for CRC
+    blocks = bitstring.reshape(-1, 13)
+    extended_blocks = np.pad(blocks, ((0, 0), (0, CRC_BITS)), constant_values=0)
+
+    # Step 3: Calculate the CRC for each block using the CRC polynomial
+    for i in range(13):
+        mask = extended_blocks[:, i] == 1
+        for j in range(CRC_BITS + 1):
+            extended_blocks[mask, i + j] ^= (CRC_POLY >> (CRC_BITS - j)) & 1
+   
+    # Step 4: Append the calculated CRC bits to the original blocks
+    crc = extended_blocks[:, -CRC_BITS:]
+    combined_blocks = np.hstack((blocks, crc))
+    
+    # Step 5: Reshape the combined blocks into 4-bit groups and encode with Hamming (7,4)
+    reshaped_blocks = combined_blocks.reshape(-1, 4)
+    encoded_blocks = np.dot(reshaped_blocks, G) % 2
+
+    return encoded_blocks.flatten()  # Return the flattened encoded bitstring
+
+
+
+
+# Long decoding loops call check_cancel() (if given) every CANCEL_CHECK_INTERVAL iterations; it is expected to
+# raise an exception to abort the loop (the GUI uses it to cancel a running pipeline).
+CANCEL_CHECK_INTERVAL = 1 << 14
+
+
+# Function to decode the data after CRC and Hamming decoding
+@register_kernel("crc_hamming_decode_and_validate")
+def crc_hamming_decode_and_validate(received_bitstring, check_cancel=None):
+    # Initialize variables for decoded data and block validation tracking
+    decoded_blocks = [] # Stores the decoded bits from valid blocks
+    valid_indices = [] # List to store the indices of valid blocks' bits
+    valid_blocks = 0 # Counter to track the number of valid blocks
+    invalid_blocks = 0 # Counter to track the number of invalid blocks
+    current_index = 0 # Tracks the starting index for each block in the original bitstring
+    
+    # Process the received bitstring in chunks of 28 bits (size of one block with Hamming and CRC
+    for i in range(0, len(received_bitstring), 28):
+        if check_cancel is not None and i % (28 * CANCEL_CHECK_INTERVAL) == 0:
+            check_cancel()
+        received_block = received_bitstring[i:i+28] # Extract the current block
+        if len(received_block) != 28:
+            continue  # Skip incomplete blocks
+
+        # Decode each 7-bit segment within the 28-bit block using Hamming
+        decoded_block = [] # Store the 4-bit decoded outputs for this block
+        for j in range(0, 28, 7):
+            decoded_block.extend(hamming_decode_7bit(received_block[j:j+7]))
+
+        # Check CRC for the decoded block
+        if crc_check(np.array(decoded_block)):
+            # If the block is valid, exclude the CRC bits and add the data bits to the result
+            decoded_blocks.extend(decoded_block[:-CRC_BITS]) # Add the first 13 bits (data) to the result
+            # Track the indices of the valid bits in the original data
+            valid_indices.extend(range(current_index, current_index + 13))
+            valid_blocks += 1 # Increment the valid block counter
+        else:
+            invalid_blocks += 1 # Increment the invalid block counter
+
+        # Update the starting index for the next block
+        current_index += 13
+
+    # Return the decoded data, indices of valid bits, and block statistics
+    return np.array(decoded_blocks), valid_indices, valid_blocks, invalid_blocks
+
+
+
+# Function to introduce random errors
+# With an rng (numpy Generator) the flip positions are drawn from it, so seeded runs are reproducible.
+def introduce_errors(encoded_bitstring, error_rate, rng=None):
+    received_bitstring = np.copy(encoded_bitstring)  # Create a copy of the bitstring to avoid modifying the original
+    if error_rate == 0:
+        return received_bitstring  # No errors injected
+    if rng is not None:
+        block_starts = np.arange(0, len(received_bitstring), error_rate)
+        block_sizes = np.minimum(block_starts + error_rate, len(received_bitstring)) - block_starts
+        received_bitstring[block_starts + rng.integers(0, block_sizes)] ^= 1
+        return received_bitstring
+    
+    # Inject errors into the bitstring randomly at intervals determined by the error rate
+    for i in range(0, len(received_bitstring), error_rate):
+        block_start = i # Start of the current block
+        block_end = min(i + error_rate, len(received_bitstring)) # End of the current block
+        error_index = random.randint(block_start, block_end - 1) # Select a random bit to flip
+        received_bitstring[error_index] ^= 1 # Flip the selected bit
+    return received_bitstring
+
+    
+
+# Binary symmetric channel: every bit is flipped independently with probability flip_probability
+def bsc_errors(encoded_bitstring, flip_probability, rng=None):
+    rng = np.random.default_rng() if rng is None else rng
+    flips = rng.random(len(encoded_bitstring)) < flip_probability
+    return np.bitwise_xor(encoded_bitstring, flips.astype(encoded_bitstring.dtype))
+
+
+
+# Gilbert-Elliott burst channel: a two-state Markov chain (good/bad) with a flip probability per state.
+# The state sequence is built from alternating geometric run lengths, starting in the good state.
+def burst_errors(encoded_bitstring, p_good_to_bad, p_bad_to_good, p_bad, p_good=0.0, rng=None):
+    rng = np.random.default_rng() if rng is None else rng
+    length = len(encoded_bitstring)
+    runs = []
+    covered = 0
+    while covered < length:
+        cycles = int(length * p_good_to_bad) + 16
+        good_runs = rng.geometric(p_good_to_bad, cycles)
+        bad_runs = rng.geometric(p_bad_to_good, cycles)
+        pairs = np.column_stack((good_runs, bad_runs)).ravel()
+        runs.append(pairs)
+        covered += int(pairs.sum())
+    run_lengths = np.concatenate(runs)
+    states = np.repeat(np.resize([0, 1], len(run_lengths)), run_lengths)[:length]
+    flips = rng.random(length) < np.where(states == 1, p_bad, p_good)
+    return np.bitwise_xor(encoded_bitstring, flips.astype(encoded_bitstring.dtype))
+
+
+
+# Block interleaver: consecutive transmitted bits are taken depth positions apart in the coded stream,
+# so a burst of up to depth bits hits different codewords. depth=1 leaves the bitstring unchanged.
+def interleave(bitstring, depth):
+    if depth <= 1:
+        return bitstring
+    padded = np.pad(bitstring, (0, (depth - len(bitstring) % depth) % depth), 'constant')
+    return padded.reshape(-1, depth).T.reshape(-1)
+
+
+def deinterleave(bitstring, depth, original_length):
+    if depth <= 1:
+        return bitstring[:original_length]
+    return bitstring.reshape(depth, -1).T.reshape(-1)[:original_length]
+
+
+
+# Function to calculate BER before and after correction
+def Calculate_Ber_NO_CRC(original, received):
+    errors = np.sum(original != received)
+    total_bits = len(original)
+    return errors / total_bits
+
+
+# Function to calculate the BER after CRC validation
+def Calculate_Ber_After_CRC(original, received, valid_indices):
+    original = np.array(original)
+    received = np.array(received)
+    # Filter the original bitstring to include only valid bits
+    original_filtered = np.array([original[idx] for idx in valid_indices if idx < len(original)])
+    # Filter the received bitstring to match the length of the valid original bitstring
+    received_filtered = received[:len(original_filtered)]
+    # Calculate the number of bit errors using XOR
+    errors = np.sum(np.array(original_filtered, dtype=np.uint8) ^ np.array(received_filtered, dtype=np.uint8))
+    # Calculate BER as the number of errors divided by the number of valid bits
+    ber = errors / len(original_filtered) if len(original_filtered) > 0 else 0
+    return ber
+
+
+
+# Predictor Calculation
+def calculate_predictor(image, out=None):
+    # creates the Predictor for each pixel based on its right neighbor in the same row for the first 5 spectral bands.
+    # The predictor is written into a preallocated int32 buffer with slicing instead of an np.roll copy.
+    bands = image[:, :, :5]
+    if out is None:
+        out = np.empty(bands.shape, dtype=np.int32)
+    out[:, :-1, :] = bands[:, 1:, :]
+    #For the last column we reuse the pixel itself to handle the missing right neighbor.
+    out[:, -1, :] = bands[:, -1, :]
+    return out
+
+
+
+# Residual Calculation: image - predictor, computed in place into an integer buffer.
+# Without an out buffer, int16 is used when every residual is guaranteed to fit (the span between the smallest and
+# largest image/predictor value is at most 32767, e.g. 14-bit sensor data), and int32 otherwise.
+def compute_residuals(image, predictor, out=None):
+    bands = image[:, :, :predictor.shape[2]]
+    if out is None:
+        low = min(int(bands.min()), int(predictor.min()))
+        high = max(int(bands.max()), int(predictor.max()))
+        out = np.empty(predictor.shape, dtype=np.int16 if high - low <= np.iinfo(np.int16).max else np.int32)
+    np.subtract(bands, predictor, out=out, dtype=out.dtype, casting='unsafe')
+    return out
+
+
+
+# Zig-zag mapping of signed residuals to non-negative symbols: 0,-1,1,-2,2,... -> 0,1,2,3,4,...
+# int16 residuals map to uint16 symbols, anything else is computed in int32 / uint32.
+def zigzag_encode(residuals):
+    if residuals.dtype != np.int16:
+        residuals = residuals.astype(np.int32, copy=False)
+    sign_shift = residuals.dtype.itemsize * 8 - 1
+    return ((residuals << 1) ^ (residuals >> sign_shift)).view(np.uint16 if residuals.dtype == np.int16 else np.uint32)
+
+
+
+# Inverse zig-zag mapping from non-negative symbols back to signed residuals
+def zigzag_decode(symbols):
+    symbols = np.asarray(symbols, dtype=np.int64)
+    return ((symbols >> 1) ^ -(symbols & 1)).astype(np.int32)
+
+
+
+# Encode-time metric shared by the GUI, the optimizer, the pass budget, the evaluation harness and the batch
+# archive: wall time of the source encoder (prediction, residuals, zig-zag, histogram, Huffman code and bit
+# assembly) divided by the number of coded samples (bands that are not coded are not counted), in nanoseconds.
+def ns_per_sample(seconds, coded_samples):
+    return seconds / max(coded_samples, 1) * 1e9
+
+
+
+# Symbol frequency counting with a histogram instead of Counter over boxed scalars
+def residual_frequencies(symbols):
+    counts = np.bincount(symbols.ravel())
+    present = np.flatnonzero(counts)
+    return list(zip(present.tolist(), counts[present].tolist()))
+
+
+
+# Bits per sample of the sensor data. Integer cubes default to their native storage depth; float cubes have no
+# implied depth, so it must be given explicitly.
+def sample_bit_depth(image, bit_depth=None):
+    if bit_depth is not None:
+        return bit_depth
+    if np.issubdtype(image.dtype, np.integer):
+        return image.dtype.itemsize * 8
+    raise ValueError(f"Cannot infer the bit depth of {image.dtype} samples; pass bit_depth explicitly.")
+
+
+
+# Near-lossless quantization of a prediction error with a maximum absolute error of max_error:
+# q = sign(e) * floor((|e| + max_error) / (2 * max_error + 1)), reconstructed as q * (2 * max_error + 1)
+def quantize_residuals(errors, max_error):
+    step = 2 * max_error + 1
+    return np.sign(errors) * ((np.abs(errors) + max_error) // step)
+
+
+
+# Closed-loop (DPCM) right-neighbor prediction shared by the near-lossless encoder and decoder.
+# Each row is scanned right to left and every pixel is predicted from the *reconstructed* right neighbor, so the
+# decoder can rebuild the same prediction and quantization errors do not accumulate. The last column has no right
+# neighbor and is predicted from the reconstructed pixel above it (the very first pixel is predicted from 0).
+# With image given, the quantized residuals are computed (encoder); otherwise they are read from quantized (decoder).
+# Reconstructed values are clamped to the range of the sample dtype (identically on both sides); clamping only moves
+# a value towards the original sample, so the max_error bound still holds.
+def _closed_loop_right_neighbor(max_error, dtype, image=None, quantized=None):
+    step = 2 * max_error + 1
+    low, high = sample_range(dtype)
+    shape = image[:, :, :5].shape if image is not None else quantized.shape
+    reconstructed = np.empty(shape, dtype=np.int32)
+    if image is not None:
+        quantized = np.empty(shape, dtype=np.int32)
+        bands = image[:, :, :5].astype(np.int32)
+
+    # Last column: vertical DPCM down the column
+    prediction = np.zeros(shape[2], dtype=np.int32)
+    for i in range(shape[0]):
+        if image is not None:
+            quantized[i, -1, :] = quantize_residuals(bands[i, -1, :] - prediction, max_error)
+        reconstructed[i, -1, :] = np.clip(prediction + quantized[i, -1, :] * step, low, high)
+        prediction = reconstructed[i, -1, :]
+
+    # Remaining columns, right to left, vectorized over rows and bands
+    for j in range(shape[1] - 2, -1, -1):
+        prediction = reconstructed[:, j + 1, :]
+        if image is not None:
+            quantized[:, j, :] = quantize_residuals(bands[:, j, :] - prediction, max_error)
+        reconstructed[:, j, :] = np.clip(prediction + quantized[:, j, :] * step, low, high)
+    return quantized, reconstructed
+
+
+
+# Smallest and largest value of an integer sample dtype
+def sample_range(dtype):
+    if not np.issubdtype(dtype, np.integer):
+        raise ValueError(f"Near-lossless coding needs integer samples, got {np.dtype(dtype)}.")
+    info = np.iinfo(dtype)
+    return int(info.min), int(info.max)
+
+
+
+# Near-lossless encoder: returns the quantized residuals (to be entropy coded) and the encoder-side reconstruction
+def near_lossless_encode(image, max_error):
+    return _closed_loop_right_neighbor(max_error, image.dtype, image=image)
+
+
+
+# Near-lossless decoder: rebuilds the image (of sample dtype `dtype`) from the quantized residuals
+def near_lossless_decode(quantized, max_error, dtype):
+    return _closed_loop_right_neighbor(max_error, dtype, quantized=np.asarray(quantized, dtype=np.int32))[1]
+
+
+
+# Rate/distortion metrics between the original bands and their reconstruction
+def max_abs_error(original, reconstructed):
+    return int(np.max(np.abs(original.astype(np.int64) - reconstructed.astype(np.int64))))
+
+
+# PSNR peak: the dynamic range (max - min) of the original samples, not the width of the storage dtype
+# (16-bit storage often holds 12 or 14-bit sensor data)
+def data_peak(original):
+    return max(int(np.max(original)) - int(np.min(original)), 1)
+
+
+def psnr(original, reconstructed, peak):
+    mse = np.mean((original.astype(np.float64) - reconstructed.astype(np.float64)) ** 2)
+    return float('inf') if mse == 0 else float(10 * np.log10(peak ** 2 / mse))
+
+
+# Mean spectral angle (in degrees) between the original and reconstructed spectrum of each pixel
+def spectral_angle(original, reconstructed):
+    original = original.reshape(-1, original.shape[-1]).astype(np.float64)
+    reconstructed = reconstructed.reshape(-1, reconstructed.shape[-1]).astype(np.float64)
+    norms = np.linalg.norm(original, axis=1) * np.linalg.norm(reconstructed, axis=1)
+    valid = norms > 0
+    cosines = np.einsum('ij,ij->i', original[valid], reconstructed[valid]) / norms[valid]
+    return float(np.degrees(np.mean(np.arccos(np.clip(cosines, -1, 1))))) if valid.any() else 0.0
+
+
+
+# Hamming Decode Bitstring function
+@register_kernel("hamming_decode_bitstring")
+def hamming_decode_bitstring(received_bitstring, original_length, check_cancel=None):
+    decoded_bitstring = [] # Initialize an empty list to store decoded bits
+    # Iterate through the received bitstring in chunks of 7 bits (Hamming block size)
+    for i in range(0, len(received_bitstring), 7):
+        if check_cancel is not None and i % (7 * CANCEL_CHECK_INTERVAL) == 0:
+            check_cancel()
+        received_block = received_bitstring[i:i+7] # Extract the current 7-bit block
+        decoded_block = hamming_decode_7bit(received_block) # Decode the 7-bit block into 4 bits
+        decoded_bitstring.extend(decoded_block) # Add the decoded bits to the result
+    return np.array(decoded_bitstring[:original_length])
+
+
+
+
+# Huffman Encoding function
+# Vectorized bit assembly: every symbol is looked up in a sorted table of code values/lengths and the code bits
+# are expanded with np.repeat, a chunk of symbols at a time to bound the temporary memory.
+HUFFMAN_CHUNK = 1 << 18
+
+@register_kernel("huffman_encode_bitstring")
+def huffman_encode_bitstring(flat_differences, huffman_tree):
+    symbols = np.asarray(flat_differences, dtype=np.int64).ravel()
+    keys = np.array(sorted(huffman_tree), dtype=np.int64)
+    codes = [huffman_tree[key] for key in keys.tolist()]
+    values = np.array([int(code, 2) if code else 0 for code in codes], dtype=np.int64)
+    lengths = np.array([len(code) for code in codes], dtype=np.int64)
+
+    encoded_chunks = []
+    for start in range(0, len(symbols), HUFFMAN_CHUNK):
+        chunk = symbols[start:start + HUFFMAN_CHUNK]
+        index = np.minimum(np.searchsorted(keys, chunk), len(keys) - 1)
+        if np.any(keys[index] != chunk):
+            raise KeyError(int(chunk[np.flatnonzero(keys[index] != chunk)[0]]))
+        chunk_lengths = lengths[index]
+        owner = np.repeat(np.arange(len(chunk)), chunk_lengths)  # Symbol that each output bit belongs to
+        offsets = np.arange(len(owner)) - np.repeat(np.cumsum(chunk_lengths) - chunk_lengths, chunk_lengths)
+        encoded_chunks.append(((values[index][owner] >> (chunk_lengths[owner] - 1 - offsets)) & 1).astype(np.uint8))
+    return np.concatenate(encoded_chunks) if encoded_chunks else np.zeros(0, dtype=np.uint8)
+
+
+
+# Function to decode Huffman encoded bit sequence
+@register_kernel("huffman_decode_bitstring")
+def huffman_decode_bitstring(encoded_data, huffman_tree, check_cancel=None):
+    decoded_data = []  # Initialize the list to store the decoded symbols
+    buffer = ""
+    inverse_huffman_tree = {v: k for k, v in huffman_tree.items()} # Create an inverse Huffman tree to map Huffman codes back to their corresponding symbols
+    # Iterate through each bit in the encoded data
+    for i, bit in enumerate(encoded_data):
+        if check_cancel is not None and i % CANCEL_CHECK_INTERVAL == 0:
+            check_cancel()
+        buffer += str(bit)  # Convert bit to string explicitly
+        if buffer in inverse_huffman_tree:
+            # Decode the symbol and add it to the decoded data
+            decoded_data.append(int(inverse_huffman_tree[buffer]))  # Ensure decoded values are integers
+            buffer = ""
+    return decoded_data
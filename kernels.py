@@ -0,0 +1,320 @@
+import os
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # Numba is optional: without it every kernel runs its NumPy reference implementation
+    numba = None
+
+
+# Compute-kernel backend registry.
+# Hot functions (CRC, the Hamming and CRC+Hamming block decoders, Huffman bit assembly/parsing, the recurrence
+# predictors) are registered under a kernel name
+# with one implementation per backend. The reference "numpy" implementation lives next to the rest of the code
+# (codec.py, predictors.py) and is registered with @register_kernel; this module adds the optional "numba" JIT
+# implementations. Callers keep using the public function names, which dispatch to the active backend.
+#
+# The backend is chosen at runtime with set_backend() or the HSI_KERNEL_BACKEND environment variable
+# ("numpy", "numba" or "auto" = numba when installed). JIT kernels are compiled with cache=True, so the machine
+# code is stored in __pycache__; warmup_kernels() compiles (or loads) all of them up front so the first real run
+# does not pay the compile latency.
+
+
+BACKENDS = ("numpy", "numba")
+KERNELS = {}  # kernel name -> {backend: function}
+_active_backend = None
+_warmed_up = set()  # Backends whose kernels have been compiled / loaded by warmup_kernels()
+
+
+def available_backends():
+    return ["numpy", "numba"] if numba is not None else ["numpy"]
+
+
+def set_backend(backend):
+    global _active_backend
+    if backend == "auto":
+        backend = "numba" if numba is not None else "numpy"
+    if backend not in available_backends():
+        raise ValueError(f"Backend {backend!r} is not available (available: {available_backends()}).")
+    _active_backend = backend
+
+
+def get_backend():
+    if _active_backend is None:
+        set_backend(os.environ.get("HSI_KERNEL_BACKEND", "auto"))
+    return _active_backend
+
+
+# Returns the implementation of a kernel for a backend (default: the active one), falling back to numpy
+def get_kernel(name, backend=None):
+    implementations = KERNELS[name]
+    return implementations.get(backend or get_backend(), implementations["numpy"])
+
+
+# Decorator registering an implementation of a kernel. Registering the reference ("numpy") implementation
+# returns a dispatcher with the same name, so existing call sites pick up the active backend transparently.
+def register_kernel(name, backend="numpy"):
+    def decorator(function):
+        KERNELS.setdefault(name, {})[backend] = function
+        if backend != "numpy":
+            return function
+
+        def dispatch(*args, **kwargs):
+            return get_kernel(name)(*args, **kwargs)
+        dispatch.__name__ = function.__name__
+        dispatch.__doc__ = function.__doc__
+        dispatch.reference = function
+        return dispatch
+    return decorator
+
+
+# Numba implementations
+if numba is not None:
+
+    # Polynomial division of a bit array (with CRC_BITS trailing zeros / CRC bits) by the CRC polynomial, in place
+    @numba.njit(cache=True)
+    def _crc_divide(bits, poly, crc_bits):
+        for i in range(len(bits) - crc_bits):
+            if bits[i]:
+                for j in range(crc_bits + 1):
+                    bits[i + j] ^= (poly >> (crc_bits - j)) & 1
+        return bits
+
+    # Hamming (7,4) correction of one 7-bit codeword starting at `start`: writes its 4 data bits to out[at:at + 4].
+    # syndrome_position maps the 3-bit syndrome (first row of H = most significant bit) to the flipped bit, or -1.
+    @numba.njit(cache=True)
+    def _hamming_correct(bits, start, parity, syndrome_position, out, at):
+        syndrome = 0
+        for row in range(3):
+            s = 0
+            for k in range(7):
+                s ^= bits[start + k] & parity[row, k]
+            syndrome = syndrome * 2 + s
+        position = syndrome_position[syndrome]
+        for k in range(4):
+            out[at + k] = bits[start + k] ^ (1 if position == k else 0)
+
+    @numba.njit(cache=True)
+    def _hamming_decode(bits, parity, syndrome_position):
+        blocks = len(bits) // 7
+        decoded = np.empty(blocks * 4, dtype=bits.dtype)
+        for b in range(blocks):
+            _hamming_correct(bits, b * 7, parity, syndrome_position, decoded, b * 4)
+        return decoded
+
+    # Whole CRC+Hamming block decoder: every 28-bit block is Hamming-corrected into 16 bits and CRC-checked; the
+    # 13 data bits of the valid blocks are kept. Returns (data bits, their indices, valid blocks, invalid blocks).
+    @numba.njit(cache=True)
+    def _crc_hamming_decode(bits, parity, syndrome_position, poly, crc_bits):
+        blocks = len(bits) // 28
+        data_bits = 16 - crc_bits
+        decoded = np.empty(blocks * data_bits, dtype=bits.dtype)
+        valid_indices = np.empty(blocks * data_bits, dtype=np.int64)
+        block = np.empty(16, dtype=bits.dtype)
+        check = np.empty(16, dtype=np.int64)
+        valid = 0
+        for b in range(blocks):
+            for c in range(4):
+                _hamming_correct(bits, b * 28 + c * 7, parity, syndrome_position, block, c * 4)
+            for k in range(16):
+                check[k] = block[k]
+            _crc_divide(check, poly, crc_bits)
+            if check[16 - crc_bits:].any():
+                continue
+            for k in range(data_bits):
+                decoded[valid * data_bits + k] = block[k]
+                valid_indices[valid * data_bits + k] = b * data_bits + k
+            valid += 1
+        return decoded[:valid * data_bits], valid_indices[:valid * data_bits], valid, blocks - valid
+
+    # Bit assembly: writes the code of every symbol (given by its index in the code table) into one bit array
+    @numba.njit(cache=True)
+    def _huffman_encode(index, values, lengths):
+        total = 0
+        for k in range(len(index)):
+            total += lengths[index[k]]
+        bits = np.empty(total, dtype=np.uint8)
+        position = 0
+        for k in range(len(index)):
+            length = lengths[index[k]]
+            value = values[index[k]]
+            for b in range(length):
+                bits[position + b] = (value >> (length - 1 - b)) & 1
+            position += length
+        return bits
+
+    # Bit parsing: walks the code trie bit by bit and emits a symbol at every leaf
+    @numba.njit(cache=True)
+    def _huffman_decode(bits, children, leaf_symbols):
+        decoded = np.empty(len(bits), dtype=np.int64)
+        count = 0
+        node = 0
+        for k in range(len(bits)):
+            node = children[node, bits[k]]
+            if node < 0:
+                break  # Not a valid code: like the reference decoder, nothing more can be decoded
+            if leaf_symbols[node] >= 0:
+                decoded[count] = leaf_symbols[node]
+                count += 1
+                node = 0
+        return decoded[:count]
+
+    @numba.njit(cache=True)
+    def _predictor_custom(image, bands):
+        rows, cols = image.shape[0], image.shape[1]
+        predictor = np.zeros((rows, cols, bands), dtype=np.int32)
+        for band in range(bands):
+            for i in range(1, rows):
+                for j in range(1, cols):
+                    total = image[i-1, j, band] + image[i, j-1, band] + image[i-1, j-1, band]
+                    count = 3
+                    if j + 1 < cols:
+                        total += image[i-1, j+1, band]
+                        count += 1
+                    if band > 0:
+                        total += image[i, j, band-1]
+                        count += 1
+                    predictor[i, j, band] = total // count
+        return predictor
+
+    @numba.njit(cache=True)
+    def _predictor_advanced(image, bands):
+        rows, cols = image.shape[0], image.shape[1]
+        predictor = np.zeros((rows, cols, bands), dtype=np.int32)
+        spatial = np.empty(4, dtype=np.int64)
+        for band in range(bands):
+            for i in range(1, rows):
+                for j in range(1, cols):
+                    spatial[0] = image[i, j-1, band]
+                    spatial[1] = image[i-1, j-1, band]
+                    spatial[2] = image[i-1, j, band]
+                    count = 3
+                    if j + 1 < cols:
+                        spatial[3] = image[i-1, j+1, band]
+                        count = 4
+                    local_mean = spatial[:count].sum() / count
+                    residual_sum = 0.0
+                    weight_sum = 0.0
+                    for k in range(count):
+                        residual_sum += spatial[k] - local_mean
+                        weight_sum += 1
+                    for z in range(1, 3):
+                        if band - z >= 0:
+                            weight = 1.0 / z
+                            residual_sum += weight * (image[i, j, band - z] - local_mean)
+                            weight_sum += weight
+                    predictor[i, j, band] = int(residual_sum / weight_sum)
+        return predictor
+
+    # Python-side wrappers converting the codec's data structures to arrays for the JIT kernels
+
+    def _huffman_tables(huffman_tree):
+        keys = np.array(sorted(huffman_tree), dtype=np.int64)
+        codes = [huffman_tree[key] for key in keys.tolist()]
+        values = np.array([int(code, 2) if code else 0 for code in codes], dtype=np.int64)
+        lengths = np.array([len(code) for code in codes], dtype=np.int64)
+        return keys, values, lengths
+
+    def _huffman_trie(huffman_tree):
+        children = [[-1, -1]]
+        leaf_symbols = [-1]
+        for symbol, code in huffman_tree.items():
+            node = 0
+            for bit in code:
+                if children[node][int(bit)] < 0:
+                    children[node][int(bit)] = len(children)
+                    children.append([-1, -1])
+                    leaf_symbols.append(-1)
+                node = children[node][int(bit)]
+            leaf_symbols[node] = int(symbol)
+        leaf_symbols[0] = -1  # An empty code ('') never decodes, as in the reference decoder
+        return np.array(children, dtype=np.int64), np.array(leaf_symbols, dtype=np.int64)
+
+    # Syndrome lookup table of the Hamming parity-check matrix H (a syndrome equal to column k flips bit k)
+    def _syndrome_table():
+        from codec import H
+        syndrome_position = np.full(8, -1, dtype=np.int64)
+        for k in range(H.shape[1]):
+            syndrome_position[int("".join(str(bit) for bit in H[:, k]), 2)] = k
+        return np.ascontiguousarray(H, dtype=np.int64), syndrome_position
+
+    def crc_encode_numba(data):
+        from codec import CRC_POLY, CRC_BITS
+        bits = np.concatenate([np.asarray(data, dtype=np.int64), np.zeros(CRC_BITS, dtype=np.int64)])
+        return _crc_divide(bits, CRC_POLY, CRC_BITS)[-CRC_BITS:]
+
+    def crc_check_numba(data):
+        from codec import CRC_POLY, CRC_BITS
+        check = np.array(data, dtype=np.int64)
+        return not _crc_divide(check, CRC_POLY, CRC_BITS)[-CRC_BITS:].any()
+
+    # Symbols are looked up (and checked) here: the JIT kernel does no bounds checking, so a symbol missing from
+    # the codebook raises KeyError like the reference instead of reading outside the table
+    # The JIT block decoders run without returning to Python, so cancellation is only checked before they start
+    def hamming_decode_bitstring_numba(received_bitstring, original_length, check_cancel=None):
+        if check_cancel is not None:
+            check_cancel()
+        if len(received_bitstring) % 7:
+            from codec import hamming_decode_bitstring
+            return hamming_decode_bitstring.reference(received_bitstring, original_length)  # Same error as the reference
+        return _hamming_decode(np.asarray(received_bitstring), *_syndrome_table())[:original_length]
+
+    def crc_hamming_decode_and_validate_numba(received_bitstring, check_cancel=None):
+        from codec import CRC_POLY, CRC_BITS
+        if check_cancel is not None:
+            check_cancel()
+        return _crc_hamming_decode(np.asarray(received_bitstring), *_syndrome_table(), CRC_POLY, CRC_BITS)
+
+    def huffman_encode_bitstring_numba(flat_differences, huffman_tree):
+        keys, values, lengths = _huffman_tables(huffman_tree)
+        symbols = np.asarray(flat_differences, dtype=np.int64).ravel()
+        index = np.minimum(np.searchsorted(keys, symbols), len(keys) - 1)
+        missing = np.flatnonzero(keys[index] != symbols)
+        if len(missing):
+            raise KeyError(int(symbols[missing[0]]))
+        return _huffman_encode(index, values, lengths)
+
+    # The JIT decoder runs without returning to Python, so cancellation is only checked before it starts
+    def huffman_decode_bitstring_numba(encoded_data, huffman_tree, check_cancel=None):
+        if check_cancel is not None:
+            check_cancel()
+        children, leaf_symbols = _huffman_trie(huffman_tree)
+        return _huffman_decode(np.asarray(encoded_data, dtype=np.int64), children, leaf_symbols).tolist()
+
+    def predictor_custom_numba(image):
+        image = np.ascontiguousarray(image, dtype=np.int32)
+        return _predictor_custom(image, min(5, image.shape[2]))
+
+    def predictor_advanced_numba(image):
+        image = np.ascontiguousarray(image, dtype=np.int32)
+        return _predictor_advanced(image, min(5, image.shape[2]))
+
+    for _name, _function in [("crc_encode", crc_encode_numba), ("crc_check", crc_check_numba),
+                             ("hamming_decode_bitstring", hamming_decode_bitstring_numba),
+                             ("crc_hamming_decode_and_validate", crc_hamming_decode_and_validate_numba),
+                             ("huffman_encode_bitstring", huffman_encode_bitstring_numba),
+                             ("huffman_decode_bitstring", huffman_decode_bitstring_numba),
+                             ("predictor_custom", predictor_custom_numba),
+                             ("predictor_advanced", predictor_advanced_numba)]:
+        register_kernel(_name, "numba")(_function)
+
+
+# Compiles (or loads from the on-disk cache) every JIT kernel on a tiny input so later calls run at full speed.
+# Call it before any timed measurement so the JIT latency is not counted. Safe to call from a background thread
+# at start-up; does nothing when the active backend is numpy or was already warmed up in this process.
+def warmup_kernels():
+    backend = get_backend()
+    if backend != "numba" or backend in _warmed_up:
+        return
+    import codec
+    import predictors
+    tree = {0: '0', 1: '10', 2: '11'}
+    bits = codec.huffman_encode_bitstring([0, 1, 2, 1], tree)
+    codec.huffman_decode_bitstring(bits, tree)
+    codec.crc_check(np.concatenate([bits[:4], codec.crc_encode(bits[:4])]))
+    codec.hamming_decode_bitstring(codec.hamming_encode_vectorized(bits[:4]), 4)
+    codec.crc_hamming_decode_and_validate(codec.crc_hamming_encode(bits[:4]))
+    cube = np.arange(3 * 3 * 3, dtype=np.int32).reshape(3, 3, 3)
+    predictors.predictor_custom(cube)
+    predictors.predictor_advanced(cube)
+    _warmed_up.add(backend)
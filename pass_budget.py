@@ -0,0 +1,210 @@
+import math
+import time
+import numpy as np
+import pandas as pd
+import huffman
+from codec import (
+    near_lossless_encode, zigzag_encode, residual_frequencies, sample_bit_depth, ns_per_sample, huffman_encode_bitstring,
+    crc_hamming_encode, hamming_encode_vectorized
+)
+from code_optimizer import FEC_OPTIONS, CRC_OPTIONS, image_key, source_encode, transmitted_length
+from predictors import predictors
+from kernels import warmup_kernels
+
+
+# Downlink pass-budget simulator.
+# Answers the operational question: how many scenes fit in one pass over the ground station?
+# Every codec configuration (predictor or near-lossless max error, FEC, CRC) is encoded on a measurement image with
+# the real encoders, which gives its compressed bits per sample (including the FEC/CRC overhead). Its encode time is
+# measured on several crops of the image (MEASUREMENT_FRACTIONS of its rows) and fitted as a fixed cost per call
+# (Huffman code construction, Python overhead) plus a steady-state cost per sample, so that the fixed cost is not
+# scaled with the scene size. These rates are scaled to the operational scene size and compared with:
+#   - the onboard compute budget: the time available to compress per pass (compute_window) on a CPU that is
+#     cpu_slowdown times slower than the measuring machine;
+#   - the link budget: link_bitrate * pass_duration * link_efficiency bits per pass.
+# Compression and downlink run as a pipeline, so the scenes per pass are limited by the slower of the two,
+# which is reported as the bottleneck.
+
+
+MEASUREMENT_FRACTIONS = (0.25, 0.5, 1.0)  # Fractions of the measurement image's rows timed for the cost fit
+TIMING_REPEATS = 2  # Each crop is timed this many times and the fastest run is kept
+MIN_MEASUREMENT_SAMPLES = 1 << 16  # Below this many coded samples the fitted per-sample cost is unreliable
+
+BUDGET_COLUMNS = ["Predictor", "Max error", "FEC", "CRC", "Compression Ratio", "Bits/sample", "Transmitted bits/scene",
+                  "Encode fixed s", "Encode ns/sample", "Encode s/scene", "Downlink s/scene", "Scenes compressed/pass",
+                  "Scenes downlinked/pass", "Scenes/pass", "Bottleneck"]
+
+
+# Pass description: link bitrate (bit/s), pass duration (s), onboard compute time available per pass (s, default:
+# the pass itself), onboard CPU slowdown relative to the measuring machine, and the fraction of the link bitrate
+# left for payload after framing/protocol overhead.
+def pass_model(link_bitrate, pass_duration, compute_window=None, cpu_slowdown=1.0, link_efficiency=1.0):
+    if link_bitrate <= 0 or pass_duration <= 0:
+        raise ValueError("Link bitrate and pass duration must be positive.")
+    if not 0 < link_efficiency <= 1:
+        raise ValueError("Link efficiency must be in (0, 1].")
+    return {"link_bitrate": link_bitrate, "pass_duration": pass_duration,
+            "compute_window": pass_duration if compute_window is None else compute_window,
+            "cpu_slowdown": cpu_slowdown, "link_efficiency": link_efficiency}
+
+
+# Source stage for one configuration: a neighbour predictor (max_error=0) or the closed-loop near-lossless
+# coder (max_error > 0). Shares the cache (and the result format) of code_optimizer.source_encode.
+def source_encode_config(image, predictor_name, max_error=0, source_cache=None):
+    if max_error == 0:
+        return source_encode(image, predictor_name, source_cache)
+    key = (image_key(image), f"near-lossless {max_error}")
+    if source_cache is not None and key in source_cache:
+        return source_cache[key]
+
+    warmup_kernels()  # Keep the JIT compile / cache-load latency out of the measured time
+    start_time = time.time()
+    quantized, _ = near_lossless_encode(image, max_error)
+    flat_symbols = zigzag_encode(quantized).ravel()
+    huffman_tree = huffman.codebook(residual_frequencies(flat_symbols))
+    if len(huffman_tree) == 1:
+        huffman_tree = {symbol: '0' for symbol in huffman_tree}  # A constant source still needs one bit per sample
+    encoded_data = huffman_encode_bitstring(flat_symbols, huffman_tree)
+    elapsed = time.time() - start_time
+
+    result = {
+        "encoded_data": encoded_data,
+        "samples": len(flat_symbols),
+        "compression_ratio": len(flat_symbols) * sample_bit_depth(image) / len(encoded_data),
+        "ns_per_pixel": ns_per_sample(elapsed, len(flat_symbols)),
+    }
+    if source_cache is not None:
+        source_cache[key] = result
+    return result
+
+
+# Measured time (s) of the channel encoder (FEC/CRC) on a source bitstring
+def channel_encode_seconds(encoded_data, fec, crc):
+    if fec == "none":
+        return 0.0
+    start_time = time.time()
+    if crc == "YES":
+        crc_hamming_encode(encoded_data)
+    else:
+        hamming_encode_vectorized(encoded_data)
+    return time.time() - start_time
+
+
+# Encode time (s) of one configuration on a crop: source stage plus FEC/CRC encoder, fastest of TIMING_REPEATS runs
+def encode_seconds(crop, predictor_name, max_error, fec, crc):
+    runs = []
+    for _ in range(TIMING_REPEATS):
+        source = source_encode_config(crop, predictor_name, max_error)
+        runs.append(source["ns_per_pixel"] * source["samples"] * 1e-9
+                    + channel_encode_seconds(source["encoded_data"], fec, crc))
+    return min(runs), source["samples"]
+
+
+# Fits encode time = fixed + per_sample * samples on crops of the image; returns (fixed s, per-sample s)
+def fit_encode_cost(image, predictor_name, max_error, fec, crc):
+    samples, seconds = [], []
+    for fraction in MEASUREMENT_FRACTIONS:
+        crop = image[:max(2, int(round(image.shape[0] * fraction)))]
+        crop_seconds, crop_samples = encode_seconds(crop, predictor_name, max_error, fec, crc)
+        samples.append(crop_samples)
+        seconds.append(crop_seconds)
+    per_sample, fixed = np.polyfit(samples, seconds, 1)
+    if per_sample <= 0:  # Timing noise swamped the trend: fall back to the full image's average cost
+        return 0.0, seconds[-1] / samples[-1]
+    return max(fixed, 0.0), per_sample
+
+
+# Budget of one configuration for one pass. bits_per_sample is the measured rate (after FEC/CRC), encode_fixed and
+# encode_per_sample the fitted encode cost; scene_samples is the number of samples of an operational scene.
+def scene_budget(bits_per_sample, encode_fixed, encode_per_sample, scene_samples, budget):
+    transmitted_bits = math.ceil(bits_per_sample * scene_samples)
+    encode_seconds = (encode_fixed + encode_per_sample * scene_samples) * budget["cpu_slowdown"]
+    downlink_seconds = transmitted_bits / (budget["link_bitrate"] * budget["link_efficiency"])
+    compressed = budget["compute_window"] / encode_seconds if encode_seconds > 0 else math.inf
+    downlinked = budget["pass_duration"] / downlink_seconds
+    return {
+        "Transmitted bits/scene": transmitted_bits,
+        "Encode fixed s": encode_fixed,
+        "Encode ns/sample": encode_per_sample * 1e9,
+        "Encode s/scene": encode_seconds,
+        "Downlink s/scene": downlink_seconds,
+        "Scenes compressed/pass": compressed,
+        "Scenes downlinked/pass": downlinked,
+        "Scenes/pass": int(min(compressed, downlinked)),
+        "Bottleneck": "CPU" if compressed < downlinked else "link",
+    }
+
+
+# Sweeps every (predictor or max error, FEC, CRC) configuration on a measurement image and returns the
+# per-pass budget table, best configurations first. scene_shape is the (rows, cols, bands) of an operational
+# scene (default: the measurement image); the rates measured on the image are scaled to it.
+# Pass the same source_cache dict to repeated calls (or to code_optimizer) to reuse the source-coding output.
+def simulate_pass_budget(image, budget, predictor_names=None, max_errors=(0,), scene_shape=None, source_cache=None,
+                         log=print):
+    predictor_names = list(predictors) if predictor_names is None else list(predictor_names)
+    source_cache = {} if source_cache is None else source_cache
+    scene_samples = int(np.prod(scene_shape if scene_shape is not None else image.shape))
+    coded_samples = image.shape[0] * image.shape[1] * min(image.shape[2], 5)
+    if coded_samples < MIN_MEASUREMENT_SAMPLES:
+        log(f"Warning: the measurement image has only {coded_samples} coded samples (< {MIN_MEASUREMENT_SAMPLES}); "
+            f"the encode cost fit and the CPU/link bottleneck are unreliable. Use a larger scene.")
+
+    sources = []
+    for max_error in max_errors:
+        # The near-lossless coder has its own (closed-loop) predictor, so it is swept once per max error
+        for name in (predictor_names if max_error == 0 else ["near-lossless"]):
+            sources.append((name, max_error, source_encode_config(image, name, max_error, source_cache)))
+
+    rows = []
+    for name, max_error, source in sources:
+        for fec in FEC_OPTIONS:
+            for crc in CRC_OPTIONS:
+                if fec == "none" and crc == "YES":
+                    continue  # CRC blocks are only defined on top of the Hamming code
+                transmitted = transmitted_length(len(source["encoded_data"]), fec, crc, 1)
+                encode_fixed, encode_per_sample = fit_encode_cost(image, name, max_error, fec, crc)
+                row = {"Predictor": name, "Max error": max_error, "FEC": fec, "CRC": crc,
+                       "Compression Ratio": source["compression_ratio"],
+                       "Bits/sample": transmitted / source["samples"]}
+                row.update(scene_budget(transmitted / source["samples"], encode_fixed, encode_per_sample,
+                                        scene_samples, budget))
+                rows.append(row)
+
+    # Best first: whole scenes per pass, then the fractional capacity of the bottleneck
+    table = pd.DataFrame(rows, columns=BUDGET_COLUMNS)
+    capacity = table[["Scenes compressed/pass", "Scenes downlinked/pass"]].min(axis=1)
+    order = np.lexsort((-capacity.to_numpy(), -table["Scenes/pass"].to_numpy()))
+    return table.iloc[order].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    import warnings
+    from predictor_evaluation import load_scene
+    warnings.filterwarnings("ignore")
+
+    parser = argparse.ArgumentParser(description="Estimate how many scenes per ground-station pass each codec configuration can compress and downlink.")
+    parser.add_argument("scene", nargs="?", default="92AV3C.lan", help="Measurement scene file (.lan or ENVI .hdr)")
+    parser.add_argument("--link-bitrate", type=float, required=True, help="Downlink bitrate (Mbit/s)")
+    parser.add_argument("--pass-duration", type=float, required=True, help="Usable pass duration (s)")
+    parser.add_argument("--compute-window", type=float, default=None,
+                        help="Onboard compression time available per pass (s, default: the pass duration)")
+    parser.add_argument("--cpu-slowdown", type=float, default=1.0, help="Onboard CPU time / measuring machine time")
+    parser.add_argument("--link-efficiency", type=float, default=1.0, help="Payload fraction of the link bitrate")
+    parser.add_argument("--scene-shape", type=int, nargs=3, default=None, metavar=("ROWS", "COLS", "BANDS"),
+                        help="Operational scene size (default: the measurement scene)")
+    parser.add_argument("--predictors", nargs="+", default=None, choices=list(predictors), metavar="NAME")
+    parser.add_argument("--max-errors", type=int, nargs="+", default=[0], help="Max absolute errors to sweep (0 = lossless)")
+    parser.add_argument("--output", default=None, help="Write the budget table to a .csv file")
+    args = parser.parse_args()
+
+    budget = pass_model(args.link_bitrate * 1e6, args.pass_duration, args.compute_window, args.cpu_slowdown,
+                        args.link_efficiency)
+    table = simulate_pass_budget(load_scene(args.scene), budget, args.predictors, args.max_errors, args.scene_shape)
+    print(table.to_string(index=False))
+    print()
+    best = table.iloc[0]
+    print(f"Best configuration: {best['Predictor']} (max error {best['Max error']}), FEC {best['FEC']}, CRC {best['CRC']}: "
+          f"{best['Scenes/pass']} scenes per pass, limited by the {best['Bottleneck']}")
+    if args.output:
+        table.to_csv(args.output, index=False)
@@ -0,0 +1,148 @@
+import time
+import numpy as np
+import pandas as pd
+import huffman
+import spectral
+from concurrent.futures import ProcessPoolExecutor
+from codec import compute_residuals, zigzag_encode, residual_frequencies, sample_bit_depth, ns_per_sample, huffman_encode_bitstring
+from predictors import predictors
+from kernels import warmup_kernels
+
+
+# Predictor evaluation harness.
+# Every (predictor, tile, band group) combination is an independent job run in a process pool. Each job
+# computes the integer residuals, their zig-zag symbol histogram and a Huffman code for that tile, and the
+# per-predictor results are aggregated into one machine-readable table (pandas DataFrame).
+
+
+PREDICTOR_BANDS = 5  # The predictors return (at most) the first 5 bands of the cube they are given
+
+RESULT_COLUMNS = ["Scene", "Predictor", "Bands", "Tiles", "Samples", "Entropy (bits/sample)",
+                  "Huffman (bits/sample)", "Compression Ratio", "ns/pixel"]
+
+
+# Image shared with the pool workers, set once per worker by the pool initializer, which also warms up the JIT
+# kernels so their compile / cache-load latency is not counted in the timed jobs
+_worker_image = None
+
+
+def _init_worker(image):
+    global _worker_image
+    _worker_image = image
+    warmup_kernels()
+
+
+# Loads a scene (.lan or ENVI .hdr) keeping the sensor's native integer samples
+def load_scene(path):
+    scene = spectral.open_image(path)
+    return np.asarray(scene.load(dtype=scene.dtype))
+
+
+# Splits the selected bands into groups the predictors can handle in one call
+def band_groups(bands):
+    bands = list(bands)
+    return [bands[i:i + PREDICTOR_BANDS] for i in range(0, len(bands), PREDICTOR_BANDS)]
+
+
+# Tile boundaries along one axis; a trailing tile narrower than 2 pixels is merged into its neighbour
+# because the predictors need at least two rows/columns for their edge handling.
+def _tile_edges(length, size):
+    edges = list(range(0, length, size)) + [length]
+    if len(edges) > 2 and edges[-1] - edges[-2] < 2:
+        del edges[-2]
+    return edges
+
+
+# Returns the (row_start, row_stop, col_start, col_stop) tiles covering the image (one tile if tile is None)
+def tile_slices(rows, cols, tile=None):
+    tile_rows, tile_cols = tile if tile is not None else (rows, cols)
+    row_edges = _tile_edges(rows, tile_rows)
+    col_edges = _tile_edges(cols, tile_cols)
+    return [(r0, r1, c0, c1)
+            for r0, r1 in zip(row_edges[:-1], row_edges[1:])
+            for c0, c1 in zip(col_edges[:-1], col_edges[1:])]
+
+
+# Total information content (in bits) of the symbols, from their histogram
+def entropy_bits(frequency):
+    counts = np.array([count for _, count in frequency], dtype=np.float64)
+    probabilities = counts / counts.sum()
+    return float(-(counts * np.log2(probabilities)).sum())
+
+
+# Exact size (in bits) of the Huffman-coded symbols, from the code lengths and the histogram
+def huffman_bits(frequency, huffman_tree):
+    # A single-symbol source still needs one bit per sample
+    return sum(max(len(huffman_tree[symbol]), 1) * count for symbol, count in frequency)
+
+
+# Evaluates one predictor on one tile and one band group. The timed section is the whole source encoder,
+# up to the Huffman bitstring, so "ns/pixel" has the same meaning as in the GUI and the optimizer (codec.ns_per_sample).
+def evaluate_tile(predictor_name, tile, band_group, image=None):
+    image = _worker_image if image is None else image
+    r0, r1, c0, c1 = tile
+    cube = image[r0:r1, c0:c1, band_group]
+
+    start_time = time.perf_counter()
+    predictor = predictors[predictor_name](cube)
+    differences = compute_residuals(cube, predictor)
+    flat_symbols = zigzag_encode(differences).ravel()
+    frequency = residual_frequencies(flat_symbols)
+    huffman_tree = huffman.codebook(frequency)
+    huffman_encode_bitstring(flat_symbols, huffman_tree)
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        "Predictor": predictor_name,
+        "Samples": differences.size,
+        "Entropy bits": entropy_bits(frequency),
+        "Huffman bits": huffman_bits(frequency, huffman_tree),
+        "Seconds": elapsed,
+    }
+
+
+# Runs the chosen predictors over the chosen bands and tiles of one image in a process pool.
+# workers=1 runs everything in the calling process; workers=None uses one process per CPU.
+def evaluate_predictors(image, predictor_names=None, bands=None, tile=None, workers=None, scene=""):
+    predictor_names = list(predictors) if predictor_names is None else list(predictor_names)
+    unknown = [name for name in predictor_names if name not in predictors]
+    if unknown:
+        raise ValueError(f"Unknown predictors: {unknown}. Available: {list(predictors)}")
+    bands = list(range(min(PREDICTOR_BANDS, image.shape[2]))) if bands is None else list(bands)
+
+    tiles = tile_slices(image.shape[0], image.shape[1], tile)
+    jobs = [(name, t, group) for name in predictor_names for t in tiles for group in band_groups(bands)]
+
+    if workers == 1:
+        warmup_kernels()
+        tile_results = [evaluate_tile(*job, image=image) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(image,)) as pool:
+            tile_results = list(pool.map(evaluate_tile, *zip(*jobs)))
+
+    # Aggregate the tile results per predictor
+    bits_per_value = sample_bit_depth(image)
+    totals = pd.DataFrame(tile_results).groupby("Predictor", sort=False).sum()
+    results = []
+    for name in predictor_names:
+        total = totals.loc[name]
+        huffman_bits_per_sample = total["Huffman bits"] / total["Samples"]
+        results.append({
+            "Scene": scene,
+            "Predictor": name,
+            "Bands": len(bands),
+            "Tiles": len(tiles),
+            "Samples": int(total["Samples"]),
+            "Entropy (bits/sample)": total["Entropy bits"] / total["Samples"],
+            "Huffman (bits/sample)": huffman_bits_per_sample,
+            "Compression Ratio": bits_per_value / huffman_bits_per_sample,
+            "ns/pixel": ns_per_sample(total["Seconds"], total["Samples"]),
+        })
+    return pd.DataFrame(results, columns=RESULT_COLUMNS)
+
+
+# Evaluates the predictors on several scene files and concatenates the per-scene tables
+def evaluate_scenes(paths, predictor_names=None, bands=None, tile=None, workers=None):
+    tables = [evaluate_predictors(load_scene(path), predictor_names, bands, tile, workers, scene=path)
+              for path in paths]
+    return pd.concat(tables, ignore_index=True)
@@ -0,0 +1,135 @@
+import numpy as np
+from kernels import register_kernel
+
+
+# Candidate predictors for the compression stage. Each predictor takes a (rows, cols, bands) cube and returns
+# an int32 prediction of its first 5 bands; the residual image - prediction is what gets entropy coded.
+
+
+# Predictor functions
+# The neighbor predictors write into a preallocated int32 buffer with slicing instead of np.roll copies.
+
+# This function predicts each pixel's value using the value of its right neighbor.
+# At the image's right edge, the last column keeps the pixel's own value.
+def predictor_right_neighbor(image):
+    bands = image[:, :, :5]
+    predictor = np.empty(bands.shape, dtype=np.int32)
+    predictor[:, :-1, :] = bands[:, 1:, :]
+    predictor[:, -1, :] = bands[:, -1, :]
+    return predictor
+
+# This function predicts each pixel's value using the value of its left neighbor.
+# At the image's left edge, the first column keeps the pixel's own value.
+def predictor_left_neighbor(image):
+    bands = image[:, :, :5]
+    predictor = np.empty(bands.shape, dtype=np.int32)
+    predictor[:, 1:, :] = bands[:, :-1, :]
+    predictor[:, 0, :] = bands[:, 0, :]
+    return predictor
+
+# This function predicts each pixel's value using the value of its top neighbor.
+# At the image's top edge, the last row keeps the pixel's own value.
+def predictor_top_neighbor(image):
+    bands = image[:, :, :5]
+    predictor = np.empty(bands.shape, dtype=np.int32)
+    predictor[:-1, :, :] = bands[1:, :, :]
+    predictor[-1, :, :] = bands[-1, :, :]
+    return predictor
+
+# This function predicts each pixel's value using the value of its bottom neighbor.
+# At the image's bottom edge, the first row keeps the pixel's own value.
+def predictor_bottom_neighbor(image):
+    bands = image[:, :, :5]
+    predictor = np.empty(bands.shape, dtype=np.int32)
+    predictor[1:, :, :] = bands[:-1, :, :]
+    predictor[0, :, :] = bands[0, :, :]
+    return predictor
+
+# This function predicts each pixel's value as the (floored) integer average of its four spatial neighbors (top, bottom, left, right).
+# At the edges of the image, the nearest valid neighbor values are used to compute the average.
+def predictor_average_neighbors(image):
+    bands = image[:, :, :5]
+    predictor = np.zeros(bands.shape, dtype=np.int32)
+    interior = predictor[1:-1, 1:-1, :]
+    interior += bands[1:-1, 2:, :]   # Right
+    interior += bands[1:-1, :-2, :]  # Left
+    interior += bands[2:, 1:-1, :]   # Top
+    interior += bands[:-2, 1:-1, :]  # Bottom
+    interior >>= 2
+    predictor[:, -1, :] = predictor[:, -2, :]
+    predictor[:, 0, :] = predictor[:, 1, :]
+    predictor[-1, :, :] = predictor[-2, :, :]
+    predictor[0, :, :] = predictor[1, :, :]
+    return predictor
+
+# This function uses a custom logic to predict each pixel's value based on its spatial neighbors
+# (top, left, top-left, top-right) and its spectral neighbor in the previous band.
+# The prediction is the floored integer average of the available neighbors; the first row and column are 0.
+@register_kernel("predictor_custom")
+def predictor_custom(image):
+    image = np.asarray(image, dtype=np.int32)  # Avoid 16-bit overflow when summing neighbors
+    rows, cols, bands = image.shape
+    bands = min(bands, 5)
+    predictor = np.zeros((rows, cols, bands), dtype=np.int32)
+
+    total = image[:-1, 1:, :bands] + image[1:, :-1, :bands] + image[:-1, :-1, :bands]  # Top, left, top-left
+    count = np.full(total.shape, 3, dtype=np.int32)
+    total[:, :-1, :] += image[:-1, 2:, :bands]  # Top-right neighbor, missing in the last column
+    count[:, :-1, :] += 1
+    total[:, :, 1:] += image[1:, 1:, :bands - 1]  # Spectral neighbor only if band > 0
+    count[:, :, 1:] += 1
+
+    predictor[1:, 1:, :] = total // count
+    return predictor
+
+# This function uses an advanced method to predict pixel values based on both spatial neighbors
+# (left, top-left, top, top-right) and spectral neighbors (previous bands with linear weighting).
+# The floating point operations are done in the same order as a per-pixel loop, so every backend gives
+# identical integer predictions.
+@register_kernel("predictor_advanced")
+def predictor_advanced(image):
+    image = np.asarray(image, dtype=np.int32)
+    rows, cols, bands = image.shape
+    bands = min(bands, 5)
+    predictor = np.zeros((rows, cols, bands), dtype=np.int32)
+
+    # Columns 1..cols-2 have four spatial neighbors, the last column has no top-right neighbor
+    for first, last, has_top_right in [(1, cols - 1, True), (cols - 1, cols, False)]:
+        if first >= last:
+            continue
+        # 1. Spatial neighbors in the same band
+        spatial_neighbors = [image[1:, first - 1:last - 1, :bands],   # Left neighbor
+                             image[:-1, first - 1:last - 1, :bands],  # Top-left neighbor
+                             image[:-1, first:last, :bands]]          # Top neighbor
+        if has_top_right:
+            spatial_neighbors.append(image[:-1, first + 1:last + 1, :bands])  # Top-right neighbor
+        local_mean = sum(spatial_neighbors) / len(spatial_neighbors)
+
+        # 2. Residuals of the spatial neighbors, equally weighted
+        residual_sum = np.zeros(local_mean.shape)
+        for neighbor in spatial_neighbors:
+            residual_sum += neighbor - local_mean
+        weight_sum = np.full(local_mean.shape, float(len(spatial_neighbors)))
+
+        # 3. Spectral neighbors in previous bands (apply linear weighting)
+        for z in range(1, 3):
+            if z < bands:
+                weight = 1.0 / z  # Linear decreasing weight for spectral neighbors
+                residual_sum[:, :, z:] += weight * (image[1:, first:last, :bands - z] - local_mean[:, :, z:])
+                weight_sum[:, :, z:] += weight
+
+        # 4. Final weighted predictor is based on weighted residuals (truncated like an int32 assignment)
+        predictor[1:, first:last, :] = residual_sum / weight_sum
+
+    return predictor
+
+# List of predictors
+predictors = {
+    "Right Neighbor": predictor_right_neighbor,
+    "Left Neighbor": predictor_left_neighbor,
+    "Top Neighbor": predictor_top_neighbor,
+    "Bottom Neighbor": predictor_bottom_neighbor,
+    "Average of Neighbors": predictor_average_neighbors,
+    "Custom Predictor": predictor_custom,
+    "Advanced Predictor": predictor_advanced
+}
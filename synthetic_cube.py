@@ -0,0 +1,163 @@
+import numpy as np
+import struct
+import os
+import spectral.io.envi as envi
+
+
+# Synthetic hyperspectral cube generator for scale testing of the codec.
+# The cube is modelled as a spatially correlated scene (a gradient plus an AR(1) random field) multiplied by a
+# smooth spectral signature, plus per-pixel noise that is correlated across bands. All randomness is derived from
+# one numpy SeedSequence: the spatial field has its own child sequence and every image line draws its noise from
+# a child indexed by the line number, so the cube depends only on the seed, not on the chunk size.
+# Samples are stored as 16-bit sensor integers scaled to the requested bit depth.
+
+
+DEFAULT_BIT_DEPTH = 14  # Bits actually used by the sensor samples (stored in int16)
+DEFAULT_CHUNK_ROWS = 64  # Number of image lines generated / written per chunk
+LAN_HEADER_SIZE = 128
+
+
+# Spatially correlated 2D field: separable AR(1) filter along rows and columns applied to white noise.
+# A correlation of 0 gives white noise, values close to 1 give smooth large-scale structures.
+def spatial_field(rows, cols, correlation, rng):
+    field = rng.standard_normal((rows, cols), dtype=np.float32)
+    if correlation > 0:
+        innovation = np.float32(np.sqrt(1 - correlation ** 2))
+        field[0, :] /= innovation  # Keep the first row at unit variance
+        for i in range(1, rows):
+            field[i, :] = correlation * field[i - 1, :] + field[i, :]
+        field *= innovation
+        field[:, 0] /= innovation
+        for j in range(1, cols):
+            field[:, j] = correlation * field[:, j - 1] + field[:, j]
+        field *= innovation
+    return field
+
+
+# Smooth spectral signature in [0, 1]: one sinusoidal period across the bands, like the original custom image
+def spectral_signature(bands):
+    return (0.5 + 0.5 * np.sin(2 * np.pi * np.arange(bands, dtype=np.float32) / bands)).astype(np.float32)
+
+
+# Generator of one image line's noise: the row-th child of the noise SeedSequence (same as spawn(), without
+# creating the children of the preceding lines)
+def _line_rng(noise_sequence, row):
+    return np.random.default_rng(np.random.SeedSequence(noise_sequence.entropy,
+                                                        spawn_key=noise_sequence.spawn_key + (row,)))
+
+
+# Generates the cube line-chunk by line-chunk, yielding (first_row, chunk) with chunk shape (chunk_rows, cols, bands).
+# spectral_correlation is the correlation coefficient of the noise between any two bands of the same pixel.
+def iter_synthetic_chunks(rows, cols, bands, seed=None, spatial_correlation=0.9, spectral_correlation=0.8,
+                          noise_level=0.05, bit_depth=DEFAULT_BIT_DEPTH, dtype=np.int16, chunk_rows=DEFAULT_CHUNK_ROWS):
+    if rows < 2 or cols < 2 or bands < 1:
+        raise ValueError("Dimensions must be at least 2x2 in the first two axes.")
+    if not 0 <= spatial_correlation < 1 or not 0 <= spectral_correlation <= 1:
+        raise ValueError("Spatial correlation must be in [0, 1) and spectral correlation in [0, 1].")
+    max_value = min(2 ** bit_depth - 1, np.iinfo(dtype).max)
+    field_sequence, noise_sequence = np.random.SeedSequence(seed).spawn(2)
+    rng = np.random.default_rng(field_sequence)
+
+    # Base scene: spatial gradient plus a correlated random field, normalized to [0, 1]
+    base = np.outer(np.linspace(0, 1, rows, dtype=np.float32), np.linspace(0, 1, cols, dtype=np.float32))
+    base += 0.25 * spatial_field(rows, cols, spatial_correlation, rng)
+    base -= base.min()
+    base /= max(float(base.max()), np.finfo(np.float32).eps)
+    signature = 0.2 + 0.8 * spectral_signature(bands)
+
+    shared_weight = np.float32(noise_level * np.sqrt(spectral_correlation))
+    own_weight = np.float32(noise_level * np.sqrt(1 - spectral_correlation))
+    for start in range(0, rows, chunk_rows):
+        stop = min(start + chunk_rows, rows)
+        # Broadcast scene x signature over the bands, then add the band-correlated noise
+        chunk = base[start:stop, :, None] * signature[None, None, :]
+        for row in range(start, stop):
+            line_rng = _line_rng(noise_sequence, row)
+            chunk[row - start] += shared_weight * line_rng.standard_normal((cols, 1), dtype=np.float32)
+            chunk[row - start] += own_weight * line_rng.standard_normal((cols, bands), dtype=np.float32)
+        chunk *= max_value
+        np.clip(chunk, 0, max_value, out=chunk)
+        yield start, np.rint(chunk).astype(dtype)
+
+
+# Builds the whole synthetic cube in memory (use write_synthetic_cube for cubes that do not fit in RAM)
+def generate_synthetic_cube(rows, cols, bands, **params):
+    cube = None
+    for start, chunk in iter_synthetic_chunks(rows, cols, bands, **params):
+        if cube is None:
+            cube = np.empty((rows, cols, bands), dtype=chunk.dtype)
+        cube[start:start + chunk.shape[0]] = chunk
+    return cube
+
+
+# Writes an Erdas 7.4 LAN header (16-bit, HEAD74) compatible with spectral.open_image
+def write_lan_header(f, rows, cols, bands):
+    header = bytearray(LAN_HEADER_SIZE)
+    header[0:6] = b'HEAD74'
+    struct.pack_into('<hh', header, 6, 2, bands)  # Packing 2 = 16 bit, number of channels
+    struct.pack_into('<iiii', header, 16, cols, rows, 0, 0)  # Pixels per line, lines, first pixel coordinates
+    struct.pack_into('<fffff', header, 108, 1.0, 0.0, 0.0, 1.0, 1.0)  # Pixel area, map origin, pixel size
+    f.write(header)
+
+
+# Opens a writable memory map of a new LAN file; returns the raw map and a (rows, cols, bands) view of it
+def _open_lan_memmap(path, rows, cols, bands):
+    with open(path, 'wb') as f:
+        write_lan_header(f, rows, cols, bands)
+        f.truncate(LAN_HEADER_SIZE + rows * cols * bands * 2)
+    # LAN data is band interleaved by line: (lines, bands, pixels)
+    data = np.memmap(path, dtype='<i2', mode='r+', offset=LAN_HEADER_SIZE, shape=(rows, bands, cols))
+    return data, data.transpose(0, 2, 1)
+
+
+# Creates an ENVI header/image pair and returns its writable (rows, cols, bands) memory map
+def _open_envi_memmap(path, rows, cols, bands, dtype, force):
+    hdr_path = path if path.endswith('.hdr') else os.path.splitext(path)[0] + '.hdr'
+    ext = '.img' if path.endswith('.hdr') else os.path.splitext(path)[1]
+    envi_image = envi.create_image(hdr_path, shape=(rows, cols, bands), dtype=dtype, interleave='bil',
+                                   ext=ext, force=force)
+    data = envi_image.open_memmap(writable=True)  # Indexed as (rows, cols, bands)
+    return data, data
+
+
+# Streams a synthetic cube straight to disk, one chunk of lines at a time, without holding the cube in RAM.
+# The format follows the extension: ".lan" writes an Erdas LAN file, ".hdr"/".img" writes an ENVI image.
+def write_synthetic_cube(path, rows, cols, bands, force=False, **params):
+    if not force and os.path.exists(path):
+        raise FileExistsError(f"{path} already exists (use force=True to overwrite).")
+    dtype = params.get('dtype', np.int16)
+    if path.lower().endswith('.lan'):
+        if np.dtype(dtype) != np.int16:
+            raise ValueError("LAN files only support 16-bit integer samples.")
+        memmap, view = _open_lan_memmap(path, rows, cols, bands)
+    else:
+        memmap, view = _open_envi_memmap(path, rows, cols, bands, dtype, force)
+
+    for start, chunk in iter_synthetic_chunks(rows, cols, bands, **params):
+        view[start:start + chunk.shape[0]] = chunk
+    memmap.flush()
+    del memmap, view
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic hyperspectral cube (.lan or ENVI .hdr/.img) chunk by chunk.")
+    parser.add_argument("path", help="Output file (.lan, .hdr or .img)")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("cols", type=int)
+    parser.add_argument("bands", type=int)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--spatial-correlation", type=float, default=0.9)
+    parser.add_argument("--spectral-correlation", type=float, default=0.8)
+    parser.add_argument("--noise-level", type=float, default=0.05)
+    parser.add_argument("--bit-depth", type=int, default=DEFAULT_BIT_DEPTH)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--force", action="store_true", help="Overwrite an existing output file")
+    args = parser.parse_args()
+
+    write_synthetic_cube(args.path, args.rows, args.cols, args.bands, force=args.force, seed=args.seed,
+                         spatial_correlation=args.spatial_correlation, spectral_correlation=args.spectral_correlation,
+                         noise_level=args.noise_level, bit_depth=args.bit_depth, chunk_rows=args.chunk_rows)
+    print(f"Wrote {args.rows}x{args.cols}x{args.bands} synthetic cube to {args.path}")
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+pytest.importorskip("numba")
+import huffman
+import codec
+from kernels import get_kernel
+from predictors import predictor_custom, predictor_advanced
+from synthetic_cube import generate_synthetic_cube
+
+
+# The numba kernels must give exactly the same results as the numpy reference implementations
+
+
+def both(name, *args):
+    return get_kernel(name, "numpy")(*args), get_kernel(name, "numba")(*args)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_predictors_match(seed):
+    rng = np.random.default_rng(seed)
+    cubes = [generate_synthetic_cube(17, 13, 7, seed=seed),
+             rng.integers(-2 ** 15, 2 ** 15, (9, 11, 3)).astype(np.int16),
+             rng.integers(0, 2 ** 16, (2, 2, 6)).astype(np.uint16)]
+    for cube in cubes:
+        for predictor in (predictor_custom, predictor_advanced):
+            reference, jit = both(predictor.__name__, cube)
+            assert np.array_equal(reference, jit)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_crc_matches(seed):
+    rng = np.random.default_rng(seed)
+    for length in (1, 4, 13, 50):
+        data = rng.integers(0, 2, length)
+        reference, jit = both("crc_encode", data.copy())
+        assert np.array_equal(reference, jit)
+        block = np.concatenate([data, reference])
+        block[rng.integers(0, len(block))] ^= rng.integers(0, 2)
+        reference, jit = both("crc_check", block)
+        assert reference == jit
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_huffman_matches(seed):
+    rng = np.random.default_rng(seed)
+    symbols = rng.geometric(0.3, 5000) - 1
+    tree = huffman.codebook(codec.residual_frequencies(symbols))
+    reference, jit = both("huffman_encode_bitstring", symbols, tree)
+    assert np.array_equal(reference, jit)
+    noisy = codec.bsc_errors(reference, 0.01, rng)
+    reference, jit = both("huffman_decode_bitstring", noisy, tree)
+    assert reference == jit
+    with pytest.raises(KeyError):
+        get_kernel("huffman_encode_bitstring", "numba")([0, 1, 10 ** 6], tree)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_block_decoders_match(seed):
+    rng = np.random.default_rng(seed)
+    data = rng.integers(0, 2, 13 * 300 + 5)
+    for flip_probability in (0.0, 0.01, 0.1):
+        received = codec.bsc_errors(codec.crc_hamming_encode(data), flip_probability, rng)
+        reference = get_kernel("crc_hamming_decode_and_validate", "numpy")(received.copy())
+        jit = get_kernel("crc_hamming_decode_and_validate", "numba")(received.copy())
+        assert np.array_equal(reference[0], jit[0])
+        assert np.array_equal(reference[1], jit[1])
+        assert reference[2:] == jit[2:]
+
+        received = codec.bsc_errors(codec.hamming_encode_vectorized(data), flip_probability, rng)
+        reference = get_kernel("hamming_decode_bitstring", "numpy")(received.copy(), len(data))
+        jit = get_kernel("hamming_decode_bitstring", "numba")(received.copy(), len(data))
+        assert np.array_equal(reference, jit)